@@ -0,0 +1,100 @@
+"""Per-update dispatch cost: chain of ``F.text ==`` handlers vs. the button table.
+
+    python -m benchmarks.bench_dispatch
+
+Both dispatchers carry the same 25 button labels and no-op handlers, so the
+numbers are pure aiogram routing overhead (middlewares, filters, handler
+lookup) without any network or database work. "legacy" mirrors the old
+layout: unscoped routers with one ``F.text == label`` handler per button and
+catch-all handlers in front of the group router.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.types import Chat, Message, Update, User
+
+from utils.dispatch import ButtonTable
+
+LABELS = [f"🔘 زر رقم {i}" for i in range(25)]
+NUMBER = 2_000
+
+
+async def _noop(message: Message) -> None:
+    return None
+
+
+def legacy_dispatcher() -> Dispatcher:
+    dp = Dispatcher()
+    buttons = Router()
+    for label in LABELS:
+        buttons.message.register(_noop, F.text == label)
+    catch_all = Router()
+    catch_all.message.register(_noop, F.chat.type == "private", F.text == "إحالاتي")
+    groups = Router()
+    groups.message.filter((F.chat.type == "group") | (F.chat.type == "supergroup"))
+    groups.message.register(_noop, F.text == "بسم الله")
+    groups.message.register(_noop, F.text == "الحمد لله")
+    groups.message.register(_noop)
+    dp.include_routers(buttons, catch_all, groups)
+    return dp
+
+
+def table_dispatcher() -> Dispatcher:
+    dp = Dispatcher()
+    table = ButtonTable()
+    for label in LABELS + ["إحالاتي"]:
+        table(label)(_noop)
+    private = Router()
+    private.message.filter(F.chat.type == "private")
+    table.attach(private.message)
+    groups = Router()
+    groups.message.filter(F.chat.type.in_({"group", "supergroup"}))
+    groups.message.register(_noop, F.text == "بسم الله")
+    groups.message.register(_noop, F.text == "الحمد لله")
+    groups.message.register(_noop)
+    dp.include_routers(private, groups)
+    return dp
+
+
+def _update(chat_type: str, text: str) -> Update:
+    return Update(
+        update_id=1,
+        message=Message(
+            message_id=1,
+            date=datetime.now(),
+            chat=Chat(id=-100 if chat_type != "private" else 1, type=chat_type),
+            from_user=User(id=1, is_bot=False, first_name="bench"),
+            text=text,
+        ),
+    )
+
+
+SAMPLES = {
+    "first button": _update("private", LABELS[0]),
+    "last button": _update("private", LABELS[-1]),
+    "group message": _update("supergroup", "السلام عليكم"),
+}
+
+
+async def _measure(dp: Dispatcher, bot: Bot, update: Update) -> float:
+    start = time.perf_counter()
+    for _ in range(NUMBER):
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - start) / NUMBER * 1e6
+
+
+async def main() -> None:
+    bot = Bot(token="42:BENCHMARK")
+    dispatchers = {"legacy": legacy_dispatcher(), "table": table_dispatcher()}
+    for name, update in SAMPLES.items():
+        timings = [f"{label} {await _measure(dp, bot, update):6.1f} µs" for label, dp in dispatchers.items()]
+        print(f"{name:>14}: " + " | ".join(timings))
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
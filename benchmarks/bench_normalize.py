@@ -0,0 +1,31 @@
+"""Micro-benchmark for utils.text.normalize_text.
+
+    python -m benchmarks.bench_normalize
+
+Prints the mean cost per call for a few representative chat messages; the
+target is single-digit microseconds per message.
+"""
+from __future__ import annotations
+
+import timeit
+
+from utils.text import normalize_text
+
+SAMPLES = {
+    "short": "السَّلَامُ عَلَيْكُمْ",
+    "tatweel": "مـــرحـــبـــا بالجميع",
+    "mixed": "Hello يا شباب، أين رابط المجموعة؟ 🌟",
+    "long": "إِنَّ هَذِهِ رِسَالَةٌ طَوِيلَةٌ نِسْبِيًّا " * 10,
+}
+
+NUMBER = 100_000
+
+
+def main() -> None:
+    for name, text in SAMPLES.items():
+        seconds = timeit.timeit(lambda: normalize_text(text), number=NUMBER)
+        print(f"{name:>8} ({len(text):>4} chars): {seconds / NUMBER * 1e6:6.2f} µs/call → {normalize_text(text)[:40]!r}")
+
+
+if __name__ == "__main__":
+    main()
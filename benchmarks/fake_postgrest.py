@@ -0,0 +1,317 @@
+"""In-memory stand-in for the Supabase REST API (PostgREST) used by the load test.
+
+It implements just the subset database/supabase.py relies on, over HTTP, so
+the real supabase client and query builders are exercised unchanged:
+
+* ``GET /rest/v1/<table>`` with ``select``, ``eq/neq/gt/gte/lt/lte/is/in``
+  filters, ``order``, ``limit``/``offset``, ``count=exact`` and single-object
+  responses (``.single()`` / ``.maybe_single()``)
+* ``POST`` (insert / upsert), ``PATCH`` (update) and ``DELETE`` with filters
+* ``POST /rest/v1/rpc/register_user`` and ``rpc/increment_referral``,
+  mirroring database/migrations, and ``rpc/schema_status``
+
+Every request sleeps ``latency`` seconds (± ``jitter``) first, to model the
+network hop to a hosted database. Nothing here imports the bot's config.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from database.migrate import latest_version
+
+# Unique keys, as created by database/migrations/0002_keys_and_indexes.sql.
+UNIQUE_KEYS: Dict[str, Tuple[Tuple[str, ...], ...]] = {
+    "users": (("tg_id",),),
+    "referrals": (("user_id", "referred_user"),),
+    "rewards": (("tg_id",),),
+    "responses": (("trigger_word",),),
+    "managers": (("tg_id",),),
+    "fsm_states": (("key",),),
+}
+
+DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "users": {"username": None, "referral_count": 0, "referred_by": None},
+    "responses": {"file_id": None, "blob_key": None},
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _coerce(raw: str, sample: Any) -> Any:
+    """Turn a filter value from the query string into the column's Python type."""
+    if isinstance(sample, bool):
+        return raw == "true"
+    if isinstance(sample, int):
+        return int(raw)
+    if isinstance(sample, float):
+        return float(raw)
+    return raw
+
+
+def _split_in(raw: str) -> List[str]:
+    return [v.strip().strip('"') for v in raw[1:-1].split(",") if v.strip()]
+
+
+def _compare(op: str, value: Any, raw: str) -> bool:
+    if op == "is":
+        return value is None if raw == "null" else value == (raw == "true")
+    if value is None:
+        return False
+    if op == "in":
+        return value in [_coerce(v, value) for v in _split_in(raw)]
+    target = _coerce(raw, value)
+    if op == "eq":
+        return value == target
+    if op == "neq":
+        return value != target
+    if op == "gt":
+        return value > target
+    if op == "gte":
+        return value >= target
+    if op == "lt":
+        return value < target
+    if op == "lte":
+        return value <= target
+    raise ValueError(f"Unsupported filter operator {op!r}")
+
+
+class FakePostgrest:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self._next_id: Counter = Counter()
+        # Requests served, by "<METHOD> <table>" / "RPC <function>".
+        self.calls: Counter = Counter()
+        self.rpcs: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "register_user": self._rpc_register_user,
+            "increment_referral": self._rpc_increment_referral,
+            "schema_status": self._rpc_schema_status,
+        }
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    # Direct (non-HTTP) access for seeding and assertions
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        return self.tables.setdefault(table, [])
+
+    def insert(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        row = {**DEFAULTS.get(table, {}), **row}
+        if "id" not in row:
+            self._next_id[table] += 1
+            row["id"] = self._next_id[table]
+        else:
+            self._next_id[table] = max(self._next_id[table], row["id"])
+        row.setdefault("created_at", _now())
+        self.rows(table).append(row)
+        return row
+
+    def find_conflict(self, table: str, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        for columns in UNIQUE_KEYS.get(table, ()):
+            if not all(c in row for c in columns):
+                continue
+            for existing in self.rows(table):
+                if all(existing.get(c) == row[c] for c in columns):
+                    return existing
+        return None
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    # Server lifecycle
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/rest/v1/rpc/{function}", self._handle_rpc)
+        app.router.add_route("*", "/rest/v1/{table}", self._handle_table)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _delay(self) -> None:
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    # PostgREST emulation
+
+    async def _handle_table(self, request: web.Request) -> web.Response:
+        await self._delay()
+        table = request.match_info["table"]
+        self.calls[f"{request.method} {table}"] += 1
+        params = request.rel_url.query
+        prefer = request.headers.get("Prefer", "")
+        rows = self.rows(table)
+
+        if request.method == "POST":
+            body = await request.json()
+            upsert = "resolution=merge-duplicates" in prefer
+            ignore = "resolution=ignore-duplicates" in prefer
+            result = []
+            for values in body if isinstance(body, list) else [body]:
+                existing = self.find_conflict(table, values)
+                if existing is not None:
+                    if ignore:
+                        continue
+                    if not upsert:
+                        return self._error(409, "23505", "duplicate key value violates unique constraint")
+                    existing.update(values)
+                    result.append(existing)
+                else:
+                    result.append(self.insert(table, values))
+            return self._rows_response(request, result, status=201)
+
+        matched = [row for row in rows if self._matches(row, params)]
+        if request.method == "PATCH":
+            values = await request.json()
+            for row in matched:
+                row.update(values)
+            return self._rows_response(request, matched)
+        if request.method == "DELETE":
+            gone = {id(row) for row in matched}
+            self.tables[table] = [row for row in rows if id(row) not in gone]
+            return self._rows_response(request, matched)
+
+        total = len(matched)
+        matched = self._order(matched, params.get("order"))
+        offset = int(params.get("offset", 0))
+        limit = params.get("limit")
+        matched = matched[offset:offset + int(limit)] if limit is not None else matched[offset:]
+        response = self._rows_response(request, self._project(matched, params.get("select")))
+        if "count=exact" in prefer:
+            end = offset + len(matched) - 1
+            response.headers["Content-Range"] = f"{offset}-{end}/{total}" if matched else f"*/{total}"
+        return response
+
+    async def _handle_rpc(self, request: web.Request) -> web.Response:
+        await self._delay()
+        name = request.match_info["function"]
+        self.calls[f"RPC {name}"] += 1
+        func = self.rpcs.get(name)
+        if func is None:
+            return self._error(404, "PGRST202", f"Could not find the function {name}")
+        args = await request.json() if request.can_read_body else {}
+        return web.json_response(func(args))
+
+    @staticmethod
+    def _matches(row: Dict[str, Any], params) -> bool:
+        for column, condition in params.items():
+            if column in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                continue
+            op, _, raw = condition.partition(".")
+            if op == "not":
+                op, _, raw = raw.partition(".")
+                if _compare(op, row.get(column), raw):
+                    return False
+            elif not _compare(op, row.get(column), raw):
+                return False
+        return True
+
+    @staticmethod
+    def _order(rows: List[Dict[str, Any]], order: Optional[str]) -> List[Dict[str, Any]]:
+        if not order:
+            return rows
+        for term in reversed(order.split(",")):
+            column, *flags = term.split(".")
+            rows = sorted(
+                rows,
+                key=lambda r: (r.get(column) is None, r.get(column)),
+                reverse="desc" in flags,
+            )
+        return rows
+
+    @staticmethod
+    def _project(rows: List[Dict[str, Any]], select: Optional[str]) -> List[Dict[str, Any]]:
+        if not select or select == "*":
+            return rows
+        columns = [c.strip() for c in select.split(",")]
+        return [{c: row.get(c) for c in columns} for row in rows]
+
+    def _rows_response(self, request: web.Request, rows: List[Dict[str, Any]], status: int = 200) -> web.Response:
+        if request.headers.get("Accept") == "application/vnd.pgrst.object+json":
+            if len(rows) != 1:
+                return self._error(
+                    406,
+                    "PGRST116",
+                    "JSON object requested, multiple (or no) rows returned",
+                    details=f"The result contains {len(rows)} rows",
+                )
+            return web.Response(
+                status=status, text=json.dumps(rows[0], default=str), content_type="application/json"
+            )
+        if request.method != "GET" and "return=representation" not in request.headers.get("Prefer", ""):
+            return web.Response(status=201 if status == 201 else 204)
+        return web.Response(status=status, text=json.dumps(rows, default=str), content_type="application/json")
+
+    @staticmethod
+    def _error(status: int, code: str, message: str, details: Optional[str] = None) -> web.Response:
+        return web.json_response(
+            {"code": code, "message": message, "details": details, "hint": None}, status=status
+        )
+
+    # Postgres functions (database/migrations/0003_increment_referral.sql, 0004_register_user.sql)
+
+    def _user(self, tg_id: int) -> Optional[Dict[str, Any]]:
+        for row in self.rows("users"):
+            if row["tg_id"] == tg_id:
+                return row
+        return None
+
+    @staticmethod
+    def _rpc_schema_status(args: Dict[str, Any]) -> Dict[str, Any]:
+        # Always fully migrated, with every index present.
+        return {"version": latest_version(), "missing": []}
+
+    def _rpc_increment_referral(self, args: Dict[str, Any]) -> int:
+        referrer = self._user(args["p_referrer"])
+        if referrer is None:
+            return 0
+        pair = {"user_id": args["p_referrer"], "referred_user": args["p_referred"]}
+        if self.find_conflict("referrals", pair) is None:
+            self.insert("referrals", pair)
+            referrer["referral_count"] = (referrer.get("referral_count") or 0) + 1
+        return referrer.get("referral_count") or 0
+
+    def _rpc_register_user(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        tg_id, referrer_id = args["p_tg_id"], args.get("p_referrer")
+        if self._user(tg_id) is not None:
+            return {"created": False, "referral_counted": False}
+        self.insert(
+            "users",
+            {"tg_id": tg_id, "username": args.get("p_username"), "referral_count": 0,
+             "referred_by": referrer_id, "join_date": _now()},
+        )
+        if referrer_id is None or referrer_id == tg_id:
+            return {"created": True, "referral_counted": False}
+        referrer = self._user(referrer_id)
+        if referrer is None:
+            return {"created": True, "referral_counted": False}
+        count = self._rpc_increment_referral({"p_referrer": referrer_id, "p_referred": tg_id})
+        reward = False
+        if count >= args.get("p_reward_threshold", 100) and self.find_conflict("rewards", {"tg_id": referrer_id}) is None:
+            self.insert("rewards", {"tg_id": referrer_id})
+            reward = True
+        return {
+            "created": True,
+            "referral_counted": True,
+            "referrer_username": referrer.get("username"),
+            "referral_count": count,
+            "reward_granted": reward,
+        }
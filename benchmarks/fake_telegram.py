@@ -0,0 +1,130 @@
+"""Local stand-in for the Telegram Bot API used by the load test.
+
+Point aiogram at it with
+``AiohttpSession(api=TelegramAPIServer.from_base(fake.url))``. Every method
+succeeds after ``latency`` seconds (± ``jitter``): ``send*``/``edit*``/
+``copyMessage`` answer with a plausible ``Message``, ``getFile`` with a file
+that ``/file/bot<token>/<path>`` serves as ``file_size`` bytes, and anything
+else with ``true``. Nothing here imports the bot's config.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+_MEDIA_FIELDS = {
+    "sendPhoto": "photo",
+    "sendVideo": "video",
+    "sendAudio": "audio",
+    "sendVoice": "voice",
+    "sendDocument": "document",
+}
+
+
+class FakeTelegram:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, file_size: int = 256 * 1024) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.file_size = file_size
+        # Requests served, by API method name.
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self._handle_method)
+        app.router.add_get("/file/bot{token}/{path:.+}", self._handle_file)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _delay(self) -> None:
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    async def _handle_method(self, request: web.Request) -> web.Response:
+        await self._delay()
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        form = await request.post()
+        result = self._result(method, form)
+        return web.json_response({"ok": True, "result": result})
+
+    async def _handle_file(self, request: web.Request) -> web.StreamResponse:
+        await self._delay()
+        self.calls["downloadFile"] += 1
+        response = web.StreamResponse()
+        response.content_length = self.file_size
+        await response.prepare(request)
+        chunk = b"\0" * 65536
+        remaining = self.file_size
+        while remaining > 0:
+            await response.write(chunk[:remaining])
+            remaining -= len(chunk)
+        await response.write_eof()
+        return response
+
+    def _result(self, method: str, form) -> Any:
+        if method == "getMe":
+            return {"id": 42, "is_bot": True, "first_name": "LoadTest", "username": "loadtest_bot"}
+        if method == "getFile":
+            file_id = form.get("file_id", "file")
+            return {
+                "file_id": file_id,
+                "file_unique_id": f"u{file_id}",
+                "file_size": self.file_size,
+                "file_path": f"files/{file_id}",
+            }
+        if method.startswith(("send", "edit")) or method == "copyMessage":
+            return self._message(method, form)
+        return True
+
+    def _message(self, method: str, form) -> Dict[str, Any]:
+        chat_id = int(form.get("chat_id", 0))
+        message: Dict[str, Any] = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": {"id": 42, "is_bot": True, "first_name": "LoadTest"},
+        }
+        if "text" in form:
+            message["text"] = form["text"]
+        field = _MEDIA_FIELDS.get(method)
+        if field:
+            n = next(self._file_ids)
+            media = {"file_id": f"sent{n}", "file_unique_id": f"usent{n}", "file_size": self.file_size}
+            if field == "photo":
+                message["photo"] = [{**media, "width": 1280, "height": 720}]
+            else:
+                message[field] = {**media, "duration": 1} if field in ("video", "audio", "voice") else media
+                if field == "video":
+                    message[field].update(width=1280, height=720)
+        if "reply_markup" in form:
+            try:
+                markup = json.loads(form["reply_markup"])
+            except ValueError:
+                markup = None
+            if isinstance(markup, dict) and "inline_keyboard" in markup:
+                message["reply_markup"] = markup
+        return message
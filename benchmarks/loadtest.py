@@ -0,0 +1,335 @@
+"""Offline load test: the real dispatcher and routers against local fakes.
+
+    python -m benchmarks.loadtest
+    python -m benchmarks.loadtest --db-latency 0.03 --api-latency 0.08 --scale 2 --json report.json
+    python -m benchmarks.loadtest --max-p99-ms 500 --min-rate 50     # exit 1 on regression (CI)
+    python -m benchmarks.loadtest --backend sqlite                    # DB_BACKEND=sqlite in a temp file
+
+``main.create_bot()`` and ``main.create_dispatcher()`` are booted exactly as in
+production, but talk to ``FakeTelegram`` (Bot API) and ``FakePostgrest``
+(Supabase REST) on localhost, each with configurable injected latency, so no
+network access is needed. With ``--backend sqlite`` the bot's data lives in a
+temporary SQLite file instead and ``--db-latency`` does not apply. Media is stored with ``BLOB_BACKEND=local`` in a
+temporary directory, and the private-chat flood limit is raised so the admin
+flows are not throttled.
+
+Workloads, replayed one after another through ``dp.feed_update`` (so the
+update scheduler and its backpressure are part of the measurement):
+
+* group chatter     – ordinary group messages that match no trigger
+* trigger hits      – group messages containing stored triggers
+* referral signups  – a burst of ``/start <referrer>`` from new users
+* admin uploads     – the full add-photo-response flow, including download
+
+For each workload the report shows updates/sec, end-to-end latency
+percentiles (from feeding an update to its handler returning) and database
+and Bot API requests per update (for SQLite, database helper calls).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List
+
+from aiogram import BaseMiddleware
+from aiogram.types import Chat, Message, PhotoSize, TelegramObject, Update, User
+
+from benchmarks.fake_postgrest import FakePostgrest
+from benchmarks.fake_telegram import FakeTelegram
+
+ADMIN_ID = 1000
+GROUP_IDS = [-1001000000001 - i for i in range(50)]
+REFERRER_IDS = [500_000 + i for i in range(20)]
+TRIGGERS = ["السلام عليكم", "رابط المجموعة", "الدورة", "الاشتراك", "التسجيل", "المكافأة", "القوانين", "الدعم"]
+CHATTER = ["مرحبا بالجميع", "كيف حالكم اليوم", "شكرا جزيلا", "أين أجد الدرس الثالث", "صباح الخير", "ممتاز 👍"]
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+def _message(chat_id: int, user_id: int, text: str | None = None, **extra: Any) -> Update:
+    chat_type = "private" if chat_id > 0 else "supergroup"
+    return Update(
+        update_id=next(_update_ids),
+        message=Message(
+            message_id=next(_message_ids),
+            date=datetime.now(),
+            chat=Chat(id=chat_id, type=chat_type),
+            from_user=User(id=user_id, is_bot=False, first_name=f"user{user_id}", username=f"user{user_id}"),
+            text=text,
+            **extra,
+        ),
+    )
+
+
+def group_chatter(n: int) -> List[Update]:
+    return [_message(random.choice(GROUP_IDS), random.randint(1, 5000), random.choice(CHATTER)) for _ in range(n)]
+
+
+def trigger_hits(n: int) -> List[Update]:
+    return [
+        _message(random.choice(GROUP_IDS), random.randint(1, 5000), f"{random.choice(TRIGGERS)} يا شباب")
+        for _ in range(n)
+    ]
+
+
+def referral_signups(n: int) -> List[Update]:
+    return [_message(2_000_000 + i, 2_000_000 + i, f"/start {random.choice(REFERRER_IDS)}") for i in range(n)]
+
+
+def admin_uploads(n: int) -> List[Update]:
+    updates = []
+    for i in range(n):
+        photo = PhotoSize(file_id=f"admin{i}", file_unique_id=f"uadmin{i}", width=1280, height=720, file_size=1)
+        updates += [
+            _message(ADMIN_ID, ADMIN_ID, "➕ إضافة رد جديد"),
+            _message(ADMIN_ID, ADMIN_ID, f"صورة اختبار {i} {time.time_ns()}"),
+            _message(ADMIN_ID, ADMIN_ID, "صورة"),
+            _message(ADMIN_ID, ADMIN_ID, photo=[photo]),
+        ]
+    return updates
+
+
+WORKLOADS: Dict[str, Callable[[int], List[Update]]] = {
+    "group chatter": group_chatter,
+    "trigger hits": trigger_hits,
+    "referral signups": referral_signups,
+    "admin uploads": admin_uploads,
+}
+# Updates per workload at --scale 1 (admin uploads count flows of 4 updates).
+BASE_SIZES = {"group chatter": 2000, "trigger hits": 1000, "referral signups": 500, "admin uploads": 20}
+
+
+def seed(db: FakePostgrest) -> None:
+    db.insert("settings", {"explanation_mode": False})
+    for tg_id in REFERRER_IDS:
+        db.insert("users", {"tg_id": tg_id, "username": f"ref{tg_id}", "referral_count": 0})
+    for i, trigger in enumerate(TRIGGERS):
+        db.insert("responses", {"trigger_word": trigger, "response_type": "text", "content": f"رد تلقائي رقم {i}"})
+
+
+def seed_repository(repo) -> None:
+    """Same rows as ``seed``, written through a ``database.repository.Repository``."""
+    repo.set_explanation_mode(False)
+    for tg_id in REFERRER_IDS:
+        repo.register_user(tg_id, f"ref{tg_id}", None, reward_threshold=0)
+    for i, trigger in enumerate(TRIGGERS):
+        repo.insert_response({"trigger_word": trigger, "response_type": "text", "content": f"رد تلقائي رقم {i}"})
+
+
+def db_helper_calls() -> int:
+    from database.supabase import DB_CALLS
+
+    return int(sum(child.value for child in DB_CALLS._children.values()))
+
+
+class LatencyRecorder(BaseMiddleware):
+    """Outer update middleware noting when each fed update finished processing."""
+
+    def __init__(self) -> None:
+        self.sent_at: Dict[int, float] = {}
+        self.latencies: List[float] = []
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            self.latencies.append(time.perf_counter() - self.sent_at.pop(event.update_id))
+
+
+@dataclass
+class Result:
+    workload: str
+    updates: int
+    seconds: float
+    latencies: List[float] = field(repr=False)
+    db_calls: int
+    api_calls: int
+
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(p * len(ordered)) - 1)] * 1000 if ordered else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "workload": self.workload,
+            "updates": self.updates,
+            "updates_per_sec": round(self.updates / self.seconds, 1),
+            "p50_ms": round(self.percentile(0.50), 2),
+            "p95_ms": round(self.percentile(0.95), 2),
+            "p99_ms": round(self.percentile(0.99), 2),
+            "max_ms": round(self.percentile(1.0), 2),
+            "db_calls_per_update": round(self.db_calls / self.updates, 3),
+            "api_calls_per_update": round(self.api_calls / self.updates, 3),
+        }
+
+
+async def _drain(scheduler, job_queue) -> None:
+    while len(scheduler) or len(job_queue):
+        await asyncio.sleep(0.005)
+
+
+async def run_workload(name, updates, dp, bot, recorder, db_calls, api, scheduler, job_queue, rate) -> Result:
+    recorder.latencies = []
+    db_before, api_before = db_calls(), api.total_calls()
+    start = time.perf_counter()
+    for i, update in enumerate(updates):
+        if rate:
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        recorder.sent_at[update.update_id] = time.perf_counter()
+        await dp.feed_update(bot, update)
+    await _drain(scheduler, job_queue)
+    seconds = time.perf_counter() - start
+    return Result(
+        workload=name,
+        updates=len(updates),
+        seconds=seconds,
+        latencies=recorder.latencies,
+        db_calls=db_calls() - db_before,
+        api_calls=api.total_calls() - api_before,
+    )
+
+
+def _print_report(results: List[Result], args: argparse.Namespace) -> None:
+    db = "SQLite" if args.backend == "sqlite" else f"DB latency {args.db_latency * 1000:.0f} ms"
+    print(
+        f"\n{db}, API latency {args.api_latency * 1000:.0f} ms, "
+        f"scale {args.scale}, rate {'max' if not args.rate else args.rate}/s"
+    )
+    header = f"{'workload':<18}{'updates':>8}{'upd/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'db/upd':>8}{'api/upd':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        d = r.as_dict()
+        print(
+            f"{d['workload']:<18}{d['updates']:>8}{d['updates_per_sec']:>9}{d['p50_ms']:>9}{d['p95_ms']:>9}"
+            f"{d['p99_ms']:>9}{d['max_ms']:>9}{d['db_calls_per_update']:>8}{d['api_calls_per_update']:>8}"
+        )
+
+
+async def run(args: argparse.Namespace) -> List[Result]:
+    db = FakePostgrest(latency=args.db_latency, jitter=args.db_latency * args.jitter)
+    api = FakeTelegram(latency=args.api_latency, jitter=args.api_latency * args.jitter)
+    seed(db)
+    await db.start()
+    await api.start()
+    blob_dir = tempfile.mkdtemp(prefix="loadtest-blobs-")
+    sqlite_path = os.path.join(tempfile.mkdtemp(prefix="loadtest-db-"), "bot.sqlite3")
+
+    # config.py reads the environment at import time, so the bot is imported only now.
+    os.environ.update(
+        BOT_TOKEN="42:LOADTEST",
+        MAIN_ADMIN_ID=str(ADMIN_ID),
+        MANAGED_GROUP_ID=str(GROUP_IDS[0]),
+        SUPABASE_URL=db.url,
+        SUPABASE_KEY="loadtest.fake.key",
+        DB_BACKEND=args.backend,
+        DB_SQLITE_PATH=sqlite_path,
+        BLOB_BACKEND="local",
+        BLOB_DIR=blob_dir,
+        FSM_STORAGE="memory",
+        JOBS_BACKEND="memory",
+        RATE_LIMIT_BACKEND="memory",
+        PRIVATE_RATE_LIMIT="1000",
+        PRIVATE_RATE_BURST="1000",
+    )
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    import main
+    from database.repository import get_repository
+    from utils.jobs import job_queue
+    from utils.scheduler import update_scheduler
+
+    logging.getLogger().setLevel(args.log_level)
+
+    if args.backend == "sqlite":
+        seed_repository(get_repository())
+        db_calls = db_helper_calls
+    else:
+        db_calls = db.total_calls
+    await main.load_data()
+    bot = main.create_bot(AiohttpSession(api=TelegramAPIServer.from_base(api.url)))
+    dp = main.create_dispatcher()
+    recorder = LatencyRecorder()
+    dp.update.outer_middleware(recorder)
+
+    update_scheduler.start()
+    await job_queue.start(bot)
+    results = []
+    try:
+        for name, build in WORKLOADS.items():
+            if args.only and name not in args.only:
+                continue
+            updates = build(max(1, int(BASE_SIZES[name] * args.scale)))
+            results.append(
+                await run_workload(
+                    name, updates, dp, bot, recorder, db_calls, api, update_scheduler, job_queue, args.rate
+                )
+            )
+    finally:
+        await update_scheduler.stop()
+        await job_queue.stop()
+        await bot.session.close()
+        await api.stop()
+        await db.stop()
+    return results
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backend", choices=["supabase", "sqlite"], default="supabase", help="DB_BACKEND to test")
+    parser.add_argument("--db-latency", type=float, default=0.02, help="seconds per Supabase request")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="seconds per Bot API request")
+    parser.add_argument("--jitter", type=float, default=0.2, help="± fraction of the latency, random per request")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the workload sizes")
+    parser.add_argument("--rate", type=float, default=0, help="arrival rate in updates/sec (0 = as fast as possible)")
+    parser.add_argument("--only", action="append", choices=list(WORKLOADS), help="run only this workload")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--max-p99-ms", type=float, help="fail if any workload's p99 exceeds this")
+    parser.add_argument("--min-rate", type=float, help="fail if any workload handles fewer updates/sec")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv: List[str] | None = None) -> int:
+    args = parse_args(argv)
+    random.seed(1)
+    results = asyncio.run(run(args))
+    _print_report(results, args)
+    report = [r.as_dict() for r in results]
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    failed = False
+    for d in report:
+        if args.max_p99_ms is not None and d["p99_ms"] > args.max_p99_ms:
+            print(f"FAIL {d['workload']}: p99 {d['p99_ms']} ms > {args.max_p99_ms} ms")
+            failed = True
+        if args.min_rate is not None and d["updates_per_sec"] < args.min_rate:
+            print(f"FAIL {d['workload']}: {d['updates_per_sec']} updates/s < {args.min_rate}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -17,6 +17,87 @@ class BotConfig:
 class SupabaseConfig:
     url: str
     key: str
+    max_workers: int
+
+
+@dataclass
+class DatabaseConfig:
+    backend: str
+    sqlite_path: str
+    postgres_url: str
+
+
+@dataclass
+class CacheConfig:
+    responses_refresh_seconds: float
+    settings_ttl_seconds: float
+    leaderboard_refresh_seconds: float
+    managers_refresh_seconds: float
+
+
+@dataclass
+class BlobConfig:
+    backend: str
+    local_dir: str
+    bucket: str
+    max_media_size: int
+
+
+@dataclass
+class RateLimitConfig:
+    backend: str
+    redis_url: str
+    max_keys: int
+    private_rate: float
+    private_burst: float
+
+
+@dataclass
+class WebhookConfig:
+    mode: str
+    base_url: str
+    path: str
+    secret: str
+    host: str
+    port: int
+
+
+@dataclass
+class FsmConfig:
+    backend: str
+    redis_url: str
+    sqlite_path: str
+    ttl_seconds: float
+
+
+@dataclass
+class JobsConfig:
+    backend: str
+    sqlite_path: str
+    workers: int
+    max_backlog: int
+
+
+@dataclass
+class BroadcastConfig:
+    rate: float
+    concurrency: int
+    page_size: int
+    report_interval: float
+
+
+@dataclass
+class SchedulerConfig:
+    workers: int
+    max_backlog: int
+    report_interval: float
+
+
+@dataclass
+class MetricsConfig:
+    enabled: bool
+    path: str
+
 
 load_dotenv()
 
@@ -29,6 +110,79 @@ GROUP_INVITE_LINK = os.getenv("GROUP_INVITE_LINK", "https://t.me/+eNwR-cX_ZRxmMG
 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
+# Size of the thread pool that runs blocking Supabase queries off the event loop.
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "8"))
+# Where users, referrals, responses etc. live: "supabase", or "sqlite" for a
+# local file (single instance only; Supabase is still needed for supabase blobs/FSM).
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase")
+DB_SQLITE_PATH = os.getenv("DB_SQLITE_PATH", "bot.sqlite3")
+# Direct Postgres connection string, only used by `python -m database.migrate`.
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+
+# How often the in-memory responses snapshot is reloaded to pick up edits made
+# directly in the database.
+RESPONSES_REFRESH_SECONDS = float(os.getenv("RESPONSES_REFRESH_SECONDS", "300"))
+# Bot settings (explanation mode) are re-read from the DB at most this often.
+SETTINGS_TTL_SECONDS = float(os.getenv("SETTINGS_TTL_SECONDS", "30"))
+# The in-memory referral leaderboard is rebuilt from users this often.
+LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "900"))
+# The managers list is re-read this often to pick up changes made outside the bot.
+MANAGERS_REFRESH_SECONDS = float(os.getenv("MANAGERS_REFRESH_SECONDS", "300"))
+
+# Where media responses are stored: "supabase" (Storage bucket) or "local".
+BLOB_BACKEND = os.getenv("BLOB_BACKEND", "supabase")
+BLOB_DIR = os.getenv("BLOB_DIR", "blobs")
+BLOB_BUCKET = os.getenv("BLOB_BUCKET", "responses")
+# Largest media file an admin may attach to a response (Bot API downloads cap at 20 MB).
+MAX_MEDIA_SIZE_MB = int(os.getenv("MAX_MEDIA_SIZE_MB", "20"))
+
+# Anti-spam budgets are kept in process memory by default; set
+# RATE_LIMIT_BACKEND=redis to share them between several bot replicas.
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Private chat flood protection: bursts of PRIVATE_RATE_BURST messages, then
+# PRIVATE_RATE_LIMIT messages per second per user.
+PRIVATE_RATE_LIMIT = float(os.getenv("PRIVATE_RATE_LIMIT", "1"))
+PRIVATE_RATE_BURST = float(os.getenv("PRIVATE_RATE_BURST", "5"))
+
+# "polling" (default, handy for local development) or "webhook".
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Public HTTPS origin Telegram should call, e.g. https://arinas-helper.onrender.com
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Sent back by Telegram in X-Telegram-Bot-Api-Secret-Token (A-Z, a-z, 0-9, _ and -).
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("PORT", "8080"))
+
+# Where in-progress admin flows (FSM state) live: memory, redis, sqlite or supabase.
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory")
+FSM_SQLITE_PATH = os.getenv("FSM_SQLITE_PATH", "fsm.sqlite3")
+# Abandoned flows are forgotten this long after their last step.
+FSM_TTL_SECONDS = float(os.getenv("FSM_TTL_SECONDS", "86400"))
+
+# Background send queue: "memory", or "sqlite" to keep queued jobs across restarts.
+JOBS_BACKEND = os.getenv("JOBS_BACKEND", "memory")
+JOBS_SQLITE_PATH = os.getenv("JOBS_SQLITE_PATH", "jobs.sqlite3")
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+JOBS_MAX_BACKLOG = int(os.getenv("JOBS_MAX_BACKLOG", "1000"))
+
+# Mass broadcasts: stay below Telegram's ~30 messages/second global limit.
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+BROADCAST_PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", "200"))
+BROADCAST_REPORT_SECONDS = float(os.getenv("BROADCAST_REPORT_SECONDS", "5"))
+
+# Incoming updates: how many are handled at once (across chats), how many may
+# wait before polling/webhook intake is paused, and how often queue depth is logged.
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "16"))
+UPDATE_MAX_BACKLOG = int(os.getenv("UPDATE_MAX_BACKLOG", "500"))
+UPDATE_STATS_SECONDS = float(os.getenv("UPDATE_STATS_SECONDS", "60"))
+
+# Prometheus metrics on the web server (also started in polling mode when enabled).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
 
 bot_config = BotConfig(
     bot_token=BOT_TOKEN,
@@ -39,4 +193,66 @@ bot_config = BotConfig(
     group_invite_link=GROUP_INVITE_LINK,
 )
 
-supabase_config = SupabaseConfig(url=SUPABASE_URL, key=SUPABASE_KEY)
+supabase_config = SupabaseConfig(url=SUPABASE_URL, key=SUPABASE_KEY, max_workers=DB_MAX_WORKERS)
+
+db_config = DatabaseConfig(backend=DB_BACKEND, sqlite_path=DB_SQLITE_PATH, postgres_url=DATABASE_URL)
+
+cache_config = CacheConfig(
+    responses_refresh_seconds=RESPONSES_REFRESH_SECONDS,
+    settings_ttl_seconds=SETTINGS_TTL_SECONDS,
+    leaderboard_refresh_seconds=LEADERBOARD_REFRESH_SECONDS,
+    managers_refresh_seconds=MANAGERS_REFRESH_SECONDS,
+)
+
+blob_config = BlobConfig(
+    backend=BLOB_BACKEND,
+    local_dir=BLOB_DIR,
+    bucket=BLOB_BUCKET,
+    max_media_size=MAX_MEDIA_SIZE_MB * 1024 * 1024,
+)
+
+ratelimit_config = RateLimitConfig(
+    backend=RATE_LIMIT_BACKEND,
+    redis_url=REDIS_URL,
+    max_keys=RATE_LIMIT_MAX_KEYS,
+    private_rate=PRIVATE_RATE_LIMIT,
+    private_burst=PRIVATE_RATE_BURST,
+)
+
+webhook_config = WebhookConfig(
+    mode=BOT_MODE,
+    base_url=WEBHOOK_BASE_URL,
+    path=WEBHOOK_PATH,
+    secret=WEBHOOK_SECRET,
+    host=WEB_HOST,
+    port=WEB_PORT,
+)
+
+fsm_config = FsmConfig(
+    backend=FSM_STORAGE,
+    redis_url=REDIS_URL,
+    sqlite_path=FSM_SQLITE_PATH,
+    ttl_seconds=FSM_TTL_SECONDS,
+)
+
+jobs_config = JobsConfig(
+    backend=JOBS_BACKEND,
+    sqlite_path=JOBS_SQLITE_PATH,
+    workers=JOBS_WORKERS,
+    max_backlog=JOBS_MAX_BACKLOG,
+)
+
+broadcast_config = BroadcastConfig(
+    rate=BROADCAST_RATE,
+    concurrency=BROADCAST_CONCURRENCY,
+    page_size=BROADCAST_PAGE_SIZE,
+    report_interval=BROADCAST_REPORT_SECONDS,
+)
+
+scheduler_config = SchedulerConfig(
+    workers=UPDATE_WORKERS,
+    max_backlog=UPDATE_MAX_BACKLOG,
+    report_interval=UPDATE_STATS_SECONDS,
+)
+
+metrics_config = MetricsConfig(enabled=METRICS_ENABLED, path=METRICS_PATH)
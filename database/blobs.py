@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+from config import blob_config
+
+logger = logging.getLogger(__name__)
+
+
+def blob_key_for(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class MediaTooLarge(Exception):
+    def __init__(self, max_size: int) -> None:
+        super().__init__(f"Media exceeds the {max_size} byte limit")
+        self.max_size = max_size
+
+
+class BlobWriter:
+    """Write-only file object that hashes and spools a download to disk chunk by chunk.
+
+    Passed as the ``destination`` of ``Bot.download`` so media never has to
+    be held in memory; aborts with ``MediaTooLarge`` once ``max_size`` bytes
+    have been written.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self._hash = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(prefix="blob-")
+        self._file = os.fdopen(fd, "wb")
+
+    @property
+    def key(self) -> str:
+        return self._hash.hexdigest()
+
+    def write(self, chunk: bytes) -> int:
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise MediaTooLarge(self.max_size)
+        self._hash.update(chunk)
+        return self._file.write(chunk)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def discard(self) -> None:
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BlobStore(ABC):
+    """Content-addressed media storage.
+
+    Blobs are keyed by the SHA-256 of their bytes, so uploading the same file
+    twice stores it once. Implementations are blocking; use ``put_blob`` /
+    ``get_blob`` from async code.
+    """
+
+    def put(self, data: bytes) -> str:
+        key = blob_key_for(data)
+        if not self.exists(key):
+            self._write(key, data)
+        return key
+
+    def put_file(self, path: str, key: str) -> str:
+        """Store a spooled file whose SHA-256 is already known, consuming ``path``."""
+        if not self.exists(key):
+            self._write_file(key, path)
+        return key
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def _write(self, key: str, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def _write_file(self, key: str, path: str) -> None:
+        ...
+
+    @staticmethod
+    def _relative_path(key: str) -> str:
+        # Shard by prefix so no single directory ends up with every blob.
+        return f"{key[:2]}/{key}"
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.root / self._relative_path(key)
+
+    def get(self, key: str) -> bytes:
+        return self._path(key).read_bytes()
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file first so readers never see a half-written blob.
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _write_file(self, key: str, path: str) -> None:
+        dest = self._path(key)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(path, dest)
+
+
+class SupabaseBlobStore(BlobStore):
+    def __init__(self, bucket: str) -> None:
+        self.bucket = bucket
+
+    def _bucket(self):
+        from database.supabase import get_client
+
+        return get_client().storage.from_(self.bucket)
+
+    def get(self, key: str) -> bytes:
+        return self._bucket().download(self._relative_path(key))
+
+    def exists(self, key: str) -> bool:
+        found = self._bucket().list(key[:2], {"search": key})
+        return any(item.get("name") == key for item in found or [])
+
+    def _write(self, key: str, data: bytes) -> None:
+        self._bucket().upload(
+            self._relative_path(key),
+            data,
+            {"content-type": "application/octet-stream", "upsert": "true"},
+        )
+
+    def _write_file(self, key: str, path: str) -> None:
+        # storage3 streams an open file; given a path it would open one and never close it.
+        with open(path, "rb") as fh:
+            self._bucket().upload(
+                self._relative_path(key),
+                fh,
+                {"content-type": "application/octet-stream", "upsert": "true"},
+            )
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    global _blob_store
+    if _blob_store is None:
+        if blob_config.backend == "supabase":
+            _blob_store = SupabaseBlobStore(blob_config.bucket)
+        elif blob_config.backend == "local":
+            _blob_store = LocalBlobStore(blob_config.local_dir)
+        else:
+            raise RuntimeError(f"Unknown BLOB_BACKEND: {blob_config.backend!r}")
+    return _blob_store
+
+
+async def put_blob(data: bytes) -> str:
+    return await asyncio.to_thread(get_blob_store().put, data)
+
+
+async def get_blob(key: str) -> bytes:
+    return await asyncio.to_thread(get_blob_store().get, key)
+
+
+async def put_blob_file(writer: BlobWriter) -> str:
+    writer.close()
+    return await asyncio.to_thread(get_blob_store().put_file, writer.path, writer.key)
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Generic, Iterable, List, Optional, TypeVar
+
+from utils.matcher import TriggerMatcher
+from utils.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ResponseCache:
+    """In-memory snapshot of the ``responses`` table keyed by ``normalize_text(trigger)``.
+
+    Writes made through the database helpers patch the snapshot in place and
+    bump ``version``; a full reload is only applied if no write happened while
+    it was in flight, so a slow refresh can never resurrect a deleted row.
+    The trigger keys are mirrored into a ``TriggerMatcher`` so triggers can be
+    found anywhere inside a message.
+    """
+
+    def __init__(self) -> None:
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._matcher = TriggerMatcher()
+        self.loaded = False
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def replace_all(self, rows: Iterable[Dict[str, Any]], expected_version: Optional[int] = None) -> bool:
+        if expected_version is not None and expected_version != self.version:
+            return False
+        self._rows = {normalize_text(row.get("trigger_word")): row for row in rows}
+        self._matcher.reset(self._rows)
+        self.loaded = True
+        self.version += 1
+        return True
+
+    def get(self, trigger: Optional[str]) -> Optional[Dict[str, Any]]:
+        return self._rows.get(normalize_text(trigger))
+
+    def match(self, text: Optional[str]) -> List[Dict[str, Any]]:
+        """Rows for every trigger that appears as a word/phrase inside ``text``."""
+        return [self._rows[key] for key in self._matcher.find(normalize_text(text))]
+
+    def put(self, row: Dict[str, Any]) -> None:
+        key = normalize_text(row.get("trigger_word"))
+        self._rows[key] = row
+        self._matcher.add(key)
+        self.version += 1
+
+    def discard(self, trigger: Optional[str]) -> None:
+        key = normalize_text(trigger)
+        self._rows.pop(key, None)
+        self._matcher.remove(key)
+        self.version += 1
+
+
+responses_cache = ResponseCache()
+
+
+class IdSet:
+    """Set of Telegram ids mirrored from a table (e.g. ``managers``).
+
+    Like the leaderboard, adds and removals made while a reload is in flight
+    (``begin_reload`` → ``replace_all``) are replayed onto its snapshot, so
+    a slow reload cannot drop a new id or bring back a removed one.
+    """
+
+    def __init__(self) -> None:
+        self._ids: set[int] = set()
+        self.loaded = False
+        # Membership changes seen since begin_reload(), by tg_id.
+        self._during_reload: Optional[Dict[int, bool]] = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, tg_id: int) -> bool:
+        return tg_id in self._ids
+
+    def __iter__(self):
+        return iter(sorted(self._ids))
+
+    def begin_reload(self) -> None:
+        if self._during_reload is None:
+            self._during_reload = {}
+
+    def replace_all(self, ids: Iterable[int]) -> None:
+        self._ids = set(ids)
+        self.loaded = True
+        replay, self._during_reload = self._during_reload or {}, None
+        for tg_id, present in replay.items():
+            if present:
+                self._ids.add(tg_id)
+            else:
+                self._ids.discard(tg_id)
+
+    def add(self, tg_id: int) -> None:
+        if self._during_reload is not None:
+            self._during_reload[tg_id] = True
+        self._ids.add(tg_id)
+
+    def discard(self, tg_id: int) -> None:
+        if self._during_reload is not None:
+            self._during_reload[tg_id] = False
+        self._ids.discard(tg_id)
+
+
+managers_cache = IdSet()
+
+
+class CachedValue(Generic[T]):
+    """A single setting held in memory and refreshed from the DB every ``ttl`` seconds.
+
+    Only the very first read waits on ``loader`` (concurrent first reads share
+    one load); afterwards an expired value is still returned immediately while
+    a background task fetches a fresh one, so hot paths never block on the
+    database.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[T]], ttl: float, default: T) -> None:
+        self._loader = loader
+        self._ttl = ttl
+        self._value = default
+        self._loaded_at: Optional[float] = None
+        self._version = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._first_load: Optional[asyncio.Future] = None
+
+    async def get(self) -> T:
+        if self._loaded_at is None:
+            if self._first_load is None:
+                self._first_load = asyncio.ensure_future(self.refresh())
+                self._first_load.add_done_callback(self._clear_first_load)
+            await asyncio.shield(self._first_load)
+        elif time.monotonic() - self._loaded_at > self._ttl and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._background_refresh())
+        return self._value
+
+    async def refresh(self) -> T:
+        version = self._version
+        value = await self._loader()
+        # A write-through that landed while we were loading wins over the read.
+        if version == self._version:
+            self._store(value)
+        return self._value
+
+    def set(self, value: T) -> None:
+        self._version += 1
+        self._store(value)
+
+    def _clear_first_load(self, _: asyncio.Future) -> None:
+        # On failure the next read simply tries again.
+        self._first_load = None
+
+    def _store(self, value: T) -> None:
+        self._value = value
+        self._loaded_at = time.monotonic()
+
+    async def _background_refresh(self) -> None:
+        try:
+            await self.refresh()
+        except Exception:
+            logger.exception("Background refresh of cached setting failed")
+            # Keep serving the old value for another TTL rather than retrying per read.
+            self._loaded_at = time.monotonic()
+        finally:
+            self._refresh_task = None
+
+
+async def refresh_periodically(refresh: Callable[[], Awaitable[Any]], interval: float, name: str) -> None:
+    """Call ``refresh`` every ``interval`` seconds, logging (not raising) failures."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh()
+        except Exception:
+            logger.exception("Periodic refresh of %s failed", name)
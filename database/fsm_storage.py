@@ -0,0 +1,213 @@
+"""Persistent FSM storage so admin flows survive restarts and work across replicas.
+
+Backends, chosen with ``FSM_STORAGE``:
+
+* ``memory``   – aiogram's ``MemoryStorage`` (state lost on restart)
+* ``redis``    – aiogram's ``RedisStorage``; any Redis-protocol server works
+                 (Redis, KeyDB, Dragonfly, a local ``redis-server`` in tests)
+* ``sqlite``   – a local table, for single-instance deployments
+* ``supabase`` – the ``fsm_states`` table in Postgres (database/migrations/0006_fsm_states.sql)
+
+State and data are stored as compact JSON and expire ``FSM_TTL_SECONDS``
+after the last write, so abandoned flows do not pile up.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+import time
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import fsm_config, supabase_config
+
+# Expired rows are swept every this many writes rather than on every one.
+_PURGE_EVERY = 100
+
+
+def compact_dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+class TableStorage(BaseStorage):
+    """FSM storage backed by one ``(key, state, data, expires_at)`` table.
+
+    Subclasses implement the blocking row operations, run on ``workers``
+    threads. Updates of one chat are handled in order, so a key is never
+    written concurrently.
+
+    aiogram reads the state of every update, group chatter included, but the
+    bot only runs flows in private chats. Group keys (``chat_id < 0``) are
+    therefore kept in memory and never cost a round trip.
+    """
+
+    def __init__(self, ttl: float, workers: int = 1) -> None:
+        self.ttl = ttl
+        self._key_builder = DefaultKeyBuilder(with_destiny=True)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fsm")
+        self._groups = MemoryStorage()
+        self._writes = 0
+
+    async def _run(self, func, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        if key.chat_id < 0:
+            return await self._groups.set_state(key, state)
+        await self._write(key, "state", _state_name(state))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        if key.chat_id < 0:
+            return await self._groups.get_state(key)
+        row = await self._run(self._load, self._key_builder.build(key), time.time())
+        return row[0] if row else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        if key.chat_id < 0:
+            return await self._groups.set_data(key, data)
+        await self._write(key, "data", compact_dumps(data) if data else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        if key.chat_id < 0:
+            return await self._groups.get_data(key)
+        row = await self._run(self._load, self._key_builder.build(key), time.time())
+        return json.loads(row[1]) if row and row[1] else {}
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    async def _write(self, key: StorageKey, column: str, value: Optional[str]) -> None:
+        now = time.time()
+        await self._run(self._save, self._key_builder.build(key), column, value, now, now + self.ttl)
+        self._writes += 1
+        if self._writes % _PURGE_EVERY == 0:
+            await self._run(self._purge, now)
+
+    # Blocking backend operations
+
+    @abstractmethod
+    def _load(self, key: str, now: float) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        ...
+
+    @abstractmethod
+    def _save(self, key: str, column: str, value: Optional[str], now: float, expires_at: float) -> None:
+        """Set one column; drop the row once both state and data are empty.
+
+        If the existing row expired before ``now`` its other column is
+        cleared too, so an expired state or data never comes back.
+        """
+
+    @abstractmethod
+    def _purge(self, now: float) -> None:
+        ...
+
+
+class SQLiteStorage(TableStorage):
+    def __init__(self, path: str, ttl: float) -> None:
+        super().__init__(ttl)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fsm_states ("
+            "key TEXT PRIMARY KEY, state TEXT, data TEXT, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS fsm_states_expires_at ON fsm_states (expires_at)")
+
+    def _load(self, key: str, now: float) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        return self._conn.execute(
+            "SELECT state, data FROM fsm_states WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+
+    def _save(self, key: str, column: str, value: Optional[str], now: float, expires_at: float) -> None:
+        # ``column`` is one of the two literals passed by TableStorage._write.
+        other = "data" if column == "state" else "state"
+        self._conn.execute(
+            f"INSERT INTO fsm_states (key, {column}, expires_at) VALUES (?, ?, ?) "
+            f"ON CONFLICT(key) DO UPDATE SET {column} = excluded.{column}, "
+            f"{other} = CASE WHEN fsm_states.expires_at > ? THEN fsm_states.{other} END, "
+            "expires_at = excluded.expires_at",
+            (key, value, expires_at, now),
+        )
+        if value is None:
+            self._conn.execute(
+                "DELETE FROM fsm_states WHERE key = ? AND state IS NULL AND data IS NULL", (key,)
+            )
+
+    def _purge(self, now: float) -> None:
+        self._conn.execute("DELETE FROM fsm_states WHERE expires_at <= ?", (now,))
+
+    async def close(self) -> None:
+        await super().close()
+        self._conn.close()
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+class SupabaseStorage(TableStorage):
+    @staticmethod
+    def _table():
+        from database.supabase import get_client
+
+        return get_client().table("fsm_states")
+
+    def _load(self, key: str, now: float) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        res = (
+            self._table()
+            .select("state, data")
+            .eq("key", key)
+            .gt("expires_at", _iso(now))
+            .maybe_single()
+            .execute()
+        )
+        if not res or not res.data:
+            return None
+        return res.data.get("state"), res.data.get("data")
+
+    def _save(self, key: str, column: str, value: Optional[str], now: float, expires_at: float) -> None:
+        # An upsert cannot clear the other column conditionally, so drop an expired row first.
+        self._table().delete().eq("key", key).lte("expires_at", _iso(now)).execute()
+        self._table().upsert({"key": key, column: value, "expires_at": _iso(expires_at)}).execute()
+        if value is None:
+            self._table().delete().eq("key", key).is_("state", "null").is_("data", "null").execute()
+
+    def _purge(self, now: float) -> None:
+        self._table().delete().lt("expires_at", _iso(now)).execute()
+
+
+def create_fsm_storage() -> BaseStorage:
+    backend = fsm_config.backend
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "redis":
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError as e:
+            raise RuntimeError("FSM_STORAGE=redis needs the 'redis' package installed.") from e
+
+        ttl = timedelta(seconds=fsm_config.ttl_seconds)
+        return RedisStorage.from_url(
+            fsm_config.redis_url,
+            key_builder=DefaultKeyBuilder(with_destiny=True),
+            state_ttl=ttl,
+            data_ttl=ttl,
+            json_dumps=compact_dumps,
+        )
+    if backend == "sqlite":
+        return SQLiteStorage(fsm_config.sqlite_path, fsm_config.ttl_seconds)
+    if backend == "supabase":
+        return SupabaseStorage(fsm_config.ttl_seconds, workers=supabase_config.max_workers)
+    raise RuntimeError(f"Unknown FSM_STORAGE: {backend!r}")
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class Leaderboard:
+    """Referral ranking of every user, kept sorted in memory.
+
+    Seeded once from ``users`` and then updated in place whenever a referral
+    count changes, so the admin top list, further pages and a user's own rank
+    are all answered without a query. ``_order`` holds ``(-count, tg_id)``
+    pairs, so updates and rank lookups are a bisect away.
+
+    A periodic reload reads ``users`` page by page; updates that land while it
+    is in flight (``begin_reload`` → ``replace_all``) are re-applied on top of
+    its older snapshot instead of being lost.
+    """
+
+    def __init__(self) -> None:
+        self._users: Dict[int, Tuple[int, Optional[str]]] = {}
+        self._order: List[Tuple[int, int]] = []
+        self.loaded = False
+        # Updates seen since begin_reload(), by tg_id.
+        self._during_reload: Optional[Dict[int, Tuple[int, Optional[str]]]] = None
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def begin_reload(self) -> None:
+        if self._during_reload is None:
+            self._during_reload = {}
+
+    def replace_all(self, rows: Iterable[Dict[str, Any]]) -> None:
+        self._users = {
+            row["tg_id"]: (row.get("referral_count") or 0, row.get("username")) for row in rows
+        }
+        self._order = sorted((-count, tg_id) for tg_id, (count, _) in self._users.items())
+        self.loaded = True
+        replay, self._during_reload = self._during_reload or {}, None
+        for tg_id, (count, username) in replay.items():
+            # Referral counts only grow, so a higher count in the snapshot is the newer one.
+            current = self._users.get(tg_id)
+            if current is None or count >= current[0]:
+                self.update(tg_id, count, username)
+
+    def update(self, tg_id: int, count: int, username: Optional[str] = None) -> None:
+        if self._during_reload is not None:
+            seen = self._during_reload.get(tg_id)
+            self._during_reload[tg_id] = (count, username or (seen[1] if seen else None))
+        old = self._users.get(tg_id)
+        if old is not None:
+            old_count, old_username = old
+            username = username or old_username
+            if old_count == count:
+                self._users[tg_id] = (count, username)
+                return
+            del self._order[bisect_left(self._order, (-old_count, tg_id))]
+        self._users[tg_id] = (count, username)
+        insort(self._order, (-count, tg_id))
+
+    def rank(self, tg_id: int) -> Optional[int]:
+        """1-based rank; users with the same count share the same rank."""
+        entry = self._users.get(tg_id)
+        if entry is None:
+            return None
+        return bisect_left(self._order, (-entry[0], float("-inf"))) + 1
+
+    def page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        rows = []
+        for neg_count, tg_id in self._order[offset:offset + limit]:
+            rows.append({"tg_id": tg_id, "username": self._users[tg_id][1], "referral_count": -neg_count})
+        return rows
+
+
+leaderboard = Leaderboard()
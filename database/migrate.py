@@ -0,0 +1,154 @@
+"""Versioned schema migrations for the Supabase (Postgres) database.
+
+    python -m database.migrate            # apply pending migrations
+    python -m database.migrate --status   # list applied and pending, change nothing
+
+Migrations are the numbered files in database/migrations. They are applied
+in order, each in its own transaction, and recorded in ``schema_migrations``
+so every file runs once. DDL cannot go through the REST API, so this connects
+to Postgres directly with ``DATABASE_URL`` (the connection string from the
+Supabase dashboard) and needs ``pip install "psycopg[binary]"``; the bot
+itself does not.
+
+At startup ``init_supabase`` calls ``schema_status`` (0007) and refuses to
+start if the database is behind ``latest_version()`` or one of
+``REQUIRED_INDEXES`` is missing.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).with_name("migrations")
+_FILENAME = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# Indexes the hot-path queries rely on (0002_keys_and_indexes.sql).
+REQUIRED_INDEXES = (
+    "users_tg_id_key",
+    "users_referral_count_idx",
+    "referrals_user_id_referred_user_key",
+    "referrals_user_id_id_idx",
+    "rewards_tg_id_key",
+    "responses_trigger_word_key",
+    "managers_tg_id_key",
+)
+
+_BOOTSTRAP = """
+create table if not exists schema_migrations (
+    version integer primary key,
+    name text not null,
+    checksum text not null,
+    applied_at timestamptz not null default now()
+)
+"""
+# Arbitrary key for pg_advisory_lock, so two deploys never migrate at once.
+_LOCK_ID = 4_170_024
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: Path
+
+    @property
+    def sql(self) -> str:
+        return self.path.read_text(encoding="utf-8")
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.path.read_bytes()).hexdigest()
+
+
+def load_migrations() -> List[Migration]:
+    migrations: Dict[int, Migration] = {}
+    for path in MIGRATIONS_DIR.glob("*.sql"):
+        match = _FILENAME.match(path.name)
+        if not match:
+            raise RuntimeError(f"Bad migration file name {path.name!r} (expected NNNN_name.sql)")
+        version = int(match.group(1))
+        if version in migrations:
+            raise RuntimeError(f"Duplicate migration version {version:04d}")
+        migrations[version] = Migration(version, match.group(2), path)
+    return [migrations[v] for v in sorted(migrations)]
+
+
+def latest_version() -> int:
+    migrations = load_migrations()
+    return migrations[-1].version if migrations else 0
+
+
+def _connect(url: str):
+    try:
+        import psycopg
+    except ImportError as exc:
+        raise RuntimeError('Migrations need psycopg: pip install "psycopg[binary]"') from exc
+    return psycopg.connect(url, autocommit=True)
+
+
+def _applied(conn) -> Dict[int, str]:
+    return dict(conn.execute("select version, checksum from schema_migrations").fetchall())
+
+
+def migrate(url: str) -> List[Migration]:
+    """Apply every pending migration; returns the ones applied."""
+    done: List[Migration] = []
+    with _connect(url) as conn:
+        conn.execute(_BOOTSTRAP)
+        conn.execute("select pg_advisory_lock(%s)", (_LOCK_ID,))
+        try:
+            applied = _applied(conn)
+            for migration in load_migrations():
+                if migration.version in applied:
+                    if applied[migration.version] != migration.checksum:
+                        logger.warning(f"{migration.path.name} was edited after it was applied; not re-running it")
+                    continue
+                logger.info(f"Applying {migration.path.name}")
+                with conn.transaction():
+                    conn.execute(migration.sql)
+                    conn.execute(
+                        "insert into schema_migrations (version, name, checksum) values (%s, %s, %s)",
+                        (migration.version, migration.name, migration.checksum),
+                    )
+                done.append(migration)
+            if done:
+                # New or replaced functions are only callable once PostgREST reloads its schema cache.
+                conn.execute("notify pgrst, 'reload schema'")
+        finally:
+            conn.execute("select pg_advisory_unlock(%s)", (_LOCK_ID,))
+    return done
+
+
+def status(url: str) -> List[str]:
+    """One line per migration file; only reads, so ``schema_migrations`` may not exist yet."""
+    with _connect(url) as conn:
+        exists = conn.execute("select to_regclass('schema_migrations') is not null").fetchone()[0]
+        applied = _applied(conn) if exists else {}
+    lines = [] if exists else ["no migrations applied"]
+    return lines + [
+        f"{'applied' if m.version in applied else 'pending'}  {m.path.name}"
+        for m in load_migrations()
+    ]
+
+
+if __name__ == "__main__":
+    from config import db_config
+
+    parser = argparse.ArgumentParser(description="Apply database/migrations to the Supabase Postgres database.")
+    parser.add_argument("--status", action="store_true", help="only list applied and pending migrations")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if not db_config.postgres_url:
+        raise SystemExit("Set DATABASE_URL to the Postgres connection string of the Supabase project.")
+    if args.status:
+        print("\n".join(status(db_config.postgres_url)))
+    else:
+        applied = migrate(db_config.postgres_url)
+        logger.info(f"Applied {len(applied)} migrations; schema is at version {latest_version():04d}")
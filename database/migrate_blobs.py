@@ -0,0 +1,52 @@
+"""Move inline base64 media out of ``responses.content`` into the blob store.
+
+Run once after deploying the ``blob_key`` column:
+
+    python -m database.migrate_blobs
+
+Rows are processed one page at a time and each row is updated as soon as
+its blob is stored, so the command can be interrupted and re-run safely.
+"""
+from __future__ import annotations
+
+import logging
+
+from database.blobs import get_blob_store
+from database.supabase import decode_base64_to_bytes, get_client
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = ("photo", "video", "audio", "document")
+PAGE_SIZE = 20
+
+
+def migrate() -> int:
+    client = get_client()
+    store = get_blob_store()
+    moved = 0
+    while True:
+        # Migrated rows drop out of this filter, so always read the first page.
+        res = (
+            client.table("responses")
+            .select("id, trigger_word, content")
+            .in_("response_type", list(MEDIA_TYPES))
+            .is_("blob_key", "null")
+            .neq("content", "")
+            .order("id")
+            .limit(PAGE_SIZE)
+            .execute()
+        )
+        rows = res.data or []
+        if not rows:
+            return moved
+        for row in rows:
+            key = store.put(decode_base64_to_bytes(row["content"]))
+            client.table("responses").update({"blob_key": key, "content": ""}).eq("id", row["id"]).execute()
+            moved += 1
+            logger.info(f"Moved media for trigger {row['trigger_word']!r} → {key}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    count = migrate()
+    logger.info(f"Migrated {count} media responses to the blob store")
@@ -0,0 +1,52 @@
+-- Tables the bot reads and writes through database/repository.py.
+-- Deployments created by hand before migrations existed already have them;
+-- "if not exists" leaves those alone and the alters below add what is missing.
+create table if not exists users (
+    id bigserial primary key,
+    tg_id bigint not null,
+    username text,
+    referral_count integer not null default 0,
+    referred_by bigint,
+    join_date timestamptz default now()
+);
+
+create table if not exists referrals (
+    id bigserial primary key,
+    user_id bigint not null,
+    referred_user bigint not null,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists rewards (
+    id bigserial primary key,
+    tg_id bigint not null,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists responses (
+    id bigserial primary key,
+    trigger_word text not null,
+    response_type text not null,
+    content text,
+    file_id text,
+    blob_key text
+);
+
+create table if not exists managers (
+    id bigserial primary key,
+    tg_id bigint not null,
+    added_by bigint,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists settings (
+    id bigserial primary key,
+    explanation_mode boolean not null default false
+);
+
+-- Telegram file_id of the last successful upload of a media response.
+-- Sends reuse it instead of re-uploading the stored blob.
+alter table responses add column if not exists file_id text;
+-- SHA-256 key of the media bytes in the blob store (see database/blobs.py).
+-- Existing base64 rows are moved over with: python -m database.migrate_blobs
+alter table responses add column if not exists blob_key text;
@@ -0,0 +1,28 @@
+-- Unique keys and indexes behind every hot-path query, so each lookup is an
+-- index seek rather than a sequential scan. Index names match the ones
+-- Postgres gives equivalent unique constraints, so tables that already have
+-- such a constraint are skipped.
+--
+-- Creating a unique index fails if duplicates already exist. Find them with e.g.
+--   select tg_id, count(*) from users group by tg_id having count(*) > 1;
+-- keep one row per key, and run the migration again.
+
+-- get_user / register_user / broadcast pages (order by tg_id)
+create unique index if not exists users_tg_id_key on users (tg_id);
+-- Leaderboard fallback: order by referral_count desc limit n
+create index if not exists users_referral_count_idx on users (referral_count desc, tg_id);
+
+-- increment_referral dedupe (on conflict (user_id, referred_user))
+create unique index if not exists referrals_user_id_referred_user_key
+    on referrals (user_id, referred_user);
+-- "My referrals" keyset pages: where user_id = ? and id > ? order by id
+create index if not exists referrals_user_id_id_idx on referrals (user_id, id);
+
+-- register_user reward claim (on conflict (tg_id))
+create unique index if not exists rewards_tg_id_key on rewards (tg_id);
+
+-- Trigger lookups and the ordered responses snapshot
+create unique index if not exists responses_trigger_word_key on responses (trigger_word);
+
+-- Role checks
+create unique index if not exists managers_tg_id_key on managers (tg_id);
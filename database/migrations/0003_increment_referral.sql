@@ -0,0 +1,32 @@
+-- Atomic referral counting: one RPC round trip instead of check/read/update/insert.
+-- The unique index from 0002 dedupes concurrent signups of the same pair, and the
+-- UPDATE ... SET referral_count = referral_count + 1 runs under the row lock,
+-- so simultaneous referrals for one referrer can no longer lose an increment.
+
+create or replace function increment_referral(p_referrer bigint, p_referred bigint)
+returns integer
+language plpgsql
+as $$
+declare
+    v_count integer;
+begin
+    if not exists (select 1 from users where tg_id = p_referrer) then
+        return 0;
+    end if;
+
+    insert into referrals (user_id, referred_user)
+    values (p_referrer, p_referred)
+    on conflict (user_id, referred_user) do nothing;
+
+    if found then
+        update users
+           set referral_count = coalesce(referral_count, 0) + 1
+         where tg_id = p_referrer
+        returning referral_count into v_count;
+    else
+        select referral_count into v_count from users where tg_id = p_referrer;
+    end if;
+
+    return coalesce(v_count, 0);
+end;
+$$;
@@ -0,0 +1,51 @@
+-- Whole /start onboarding in one round trip: create the user, count the
+-- referral, and claim the referrer's reward once they cross the threshold.
+-- Depends on increment_referral (0003_increment_referral.sql).
+
+create or replace function register_user(
+    p_tg_id bigint,
+    p_username text,
+    p_referrer bigint default null,
+    p_reward_threshold integer default 100
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_created boolean;
+    v_ref_username text;
+    v_count integer;
+    v_reward boolean := false;
+begin
+    insert into users (tg_id, username, referral_count, referred_by, join_date)
+    values (p_tg_id, p_username, 0, p_referrer, now())
+    on conflict (tg_id) do nothing;
+    v_created := found;
+
+    if not v_created or p_referrer is null or p_referrer = p_tg_id then
+        return jsonb_build_object('created', v_created, 'referral_counted', false);
+    end if;
+
+    select username into v_ref_username from users where tg_id = p_referrer;
+    if not found then
+        return jsonb_build_object('created', true, 'referral_counted', false);
+    end if;
+
+    v_count := increment_referral(p_referrer, p_tg_id);
+
+    if v_count >= p_reward_threshold then
+        insert into rewards (tg_id, created_at)
+        values (p_referrer, now())
+        on conflict (tg_id) do nothing;
+        v_reward := found;
+    end if;
+
+    return jsonb_build_object(
+        'created', true,
+        'referral_counted', true,
+        'referrer_username', v_ref_username,
+        'referral_count', v_count,
+        'reward_granted', v_reward
+    );
+end;
+$$;
@@ -0,0 +1,16 @@
+-- Checkpoints for mass broadcasts to every user (see utils/broadcast.py).
+-- last_tg_id is the keyset cursor: everyone with tg_id <= last_tg_id is done.
+create table if not exists broadcasts (
+    id bigserial primary key,
+    text text not null,
+    admin_chat_id bigint not null,
+    status_message_id bigint,
+    status text not null default 'running',
+    total integer not null default 0,
+    last_tg_id bigint,
+    sent integer not null default 0,
+    blocked integer not null default 0,
+    failed integer not null default 0,
+    created_at timestamptz not null default now()
+);
+create index if not exists broadcasts_running on broadcasts (id) where status = 'running';
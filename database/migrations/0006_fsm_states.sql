@@ -0,0 +1,8 @@
+-- FSM storage for FSM_STORAGE=supabase (see database/fsm_storage.py).
+create table if not exists fsm_states (
+    key text primary key,
+    state text,
+    data text,
+    expires_at timestamptz not null
+);
+create index if not exists fsm_states_expires_at on fsm_states (expires_at);
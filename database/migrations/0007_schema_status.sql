@@ -0,0 +1,18 @@
+-- Startup schema check, callable over the REST API (see database/migrate.py).
+-- Returns the newest applied migration and which of p_indexes do not exist,
+-- so the bot can refuse to start against a database it would table-scan.
+create or replace function schema_status(p_indexes text[])
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'version', (select coalesce(max(version), 0) from schema_migrations),
+        'missing', coalesce(
+            (select jsonb_agg(name order by name)
+               from unnest(p_indexes) as name
+              where to_regclass(name) is null),
+            '[]'::jsonb
+        )
+    );
+$$;
@@ -0,0 +1,614 @@
+"""Storage backends behind the helpers in database/supabase.py.
+
+``Repository`` lists every blocking operation the bot needs on users,
+referrals, rewards, responses, managers, settings and broadcasts. The async
+helpers run them on the DB pool through ``db_call`` and keep the in-memory
+caches in sync, so handlers never see which backend is in use.
+
+Backends, chosen with ``DB_BACKEND``:
+
+* ``supabase`` – PostgREST over HTTPS (schema and functions from database/migrations)
+* ``sqlite``   – a local file in WAL mode for single-instance deployments and
+                 offline runs; queries are sub-millisecond with no network hop
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from postgrest.exceptions import APIError
+
+from config import db_config
+from database.migrate import REQUIRED_INDEXES, latest_version
+
+
+def _utcnow() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _check_schema(version: Optional[int], missing: List[str]) -> None:
+    """Raise unless the database has every migration and hot-path index."""
+    if version is not None and version < latest_version():
+        raise RuntimeError(
+            f"Database schema is at version {version:04d} but the code needs {latest_version():04d}. "
+            "Run: python -m database.migrate"
+        )
+    if missing:
+        raise RuntimeError(f"Database is missing indexes {missing}. Run: python -m database.migrate")
+
+
+class Repository(ABC):
+    """Blocking storage operations; called from the DB thread pool only."""
+
+    @abstractmethod
+    def check(self) -> None:
+        """Fail fast if the backend is unreachable or the schema is missing."""
+
+    # Users and referrals
+
+    @abstractmethod
+    def get_user(self, tg_id: int) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def register_user(
+        self, tg_id: int, username: Optional[str], referrer_id: Optional[int], reward_threshold: int
+    ) -> Dict[str, Any]:
+        """Create the user, count the referral and claim the reward atomically.
+
+        Returns the same object as the ``register_user`` Postgres function
+        (database/migrations/0004_register_user.sql).
+        """
+
+    @abstractmethod
+    def referral_rows(
+        self, tg_id: int, after_id: Optional[int], before_id: Optional[int], limit: int
+    ) -> List[Dict[str, Any]]:
+        """``(id, referred_user)`` rows of ``tg_id``'s referrals, keyset ordered.
+
+        Ascending by id after ``after_id``, or descending by id before
+        ``before_id`` when that is given.
+        """
+
+    @abstractmethod
+    def usernames(self, tg_ids: List[int]) -> Dict[int, Optional[str]]:
+        ...
+
+    @abstractmethod
+    def top_referrers(self, limit: int) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def referral_counts_page(self, after_tg_id: Optional[int], limit: int) -> List[Dict[str, Any]]:
+        """``(tg_id, username, referral_count)`` of users after ``after_tg_id``, by tg_id."""
+
+    @abstractmethod
+    def count_users(self) -> int:
+        ...
+
+    @abstractmethod
+    def user_ids_page(self, after_tg_id: Optional[int], limit: int) -> List[int]:
+        ...
+
+    # Responses
+
+    @abstractmethod
+    def responses_page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_response(self, trigger_word: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def insert_response(self, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update_response(self, trigger_word: str, values: Dict[str, Any]) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def delete_response(self, trigger_word: str) -> None:
+        ...
+
+    # Managers
+
+    @abstractmethod
+    def insert_manager(self, tg_id: int, added_by: int) -> None:
+        ...
+
+    @abstractmethod
+    def delete_manager(self, tg_id: int) -> None:
+        ...
+
+    @abstractmethod
+    def is_manager(self, tg_id: int) -> bool:
+        ...
+
+    @abstractmethod
+    def list_managers(self) -> List[Dict[str, Any]]:
+        ...
+
+    # Settings
+
+    @abstractmethod
+    def get_explanation_mode(self) -> bool:
+        ...
+
+    @abstractmethod
+    def set_explanation_mode(self, enabled: bool) -> None:
+        ...
+
+    # Broadcasts
+
+    @abstractmethod
+    def create_broadcast(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def update_broadcast(self, broadcast_id: int, values: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def running_broadcasts(self) -> List[Dict[str, Any]]:
+        ...
+
+
+# Media bytes live in the blob store; rows only carry ``blob_key``. ``content``
+# is still selected because text/link responses keep their body there.
+RESPONSE_COLUMNS = "id, trigger_word, response_type, content, file_id, blob_key"
+
+
+class SupabaseRepository(Repository):
+    @staticmethod
+    def _client():
+        from database.supabase import get_client
+
+        return get_client()
+
+    def check(self) -> None:
+        try:
+            res = self._client().rpc("schema_status", {"p_indexes": list(REQUIRED_INDEXES)}).execute()
+        except APIError as exc:
+            raise RuntimeError(
+                f"Cannot read the schema version ({exc.message}). Run: python -m database.migrate"
+            ) from exc
+        status = res.data or {}
+        _check_schema(status.get("version", 0), status.get("missing", []))
+
+    def get_user(self, tg_id: int) -> Optional[Dict[str, Any]]:
+        res = self._client().table("users").select("*").eq("tg_id", tg_id).maybe_single().execute()
+        return res.data if res and res.data else None
+
+    def register_user(
+        self, tg_id: int, username: Optional[str], referrer_id: Optional[int], reward_threshold: int
+    ) -> Dict[str, Any]:
+        res = self._client().rpc(
+            "register_user",
+            {
+                "p_tg_id": tg_id,
+                "p_username": username,
+                "p_referrer": referrer_id,
+                "p_reward_threshold": reward_threshold,
+            },
+        ).execute()
+        return res.data or {}
+
+    def referral_rows(
+        self, tg_id: int, after_id: Optional[int], before_id: Optional[int], limit: int
+    ) -> List[Dict[str, Any]]:
+        query = self._client().table("referrals").select("id, referred_user").eq("user_id", tg_id)
+        if before_id is not None:
+            query = query.lt("id", before_id).order("id", desc=True)
+        else:
+            query = query.order("id")
+            if after_id is not None:
+                query = query.gt("id", after_id)
+        return query.limit(limit).execute().data or []
+
+    def usernames(self, tg_ids: List[int]) -> Dict[int, Optional[str]]:
+        res = self._client().table("users").select("tg_id, username").in_("tg_id", tg_ids).execute()
+        return {u["tg_id"]: u.get("username") for u in (res.data or [])}
+
+    def top_referrers(self, limit: int) -> List[Dict[str, Any]]:
+        res = (
+            self._client()
+            .table("users")
+            .select("tg_id, username, referral_count")
+            .order("referral_count", desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return res.data or []
+
+    def referral_counts_page(self, after_tg_id: Optional[int], limit: int) -> List[Dict[str, Any]]:
+        query = self._client().table("users").select("tg_id, username, referral_count").order("tg_id").limit(limit)
+        if after_tg_id is not None:
+            query = query.gt("tg_id", after_tg_id)
+        return query.execute().data or []
+
+    def count_users(self) -> int:
+        res = self._client().table("users").select("tg_id", count="exact").limit(1).execute()
+        return res.count or 0
+
+    def user_ids_page(self, after_tg_id: Optional[int], limit: int) -> List[int]:
+        query = self._client().table("users").select("tg_id").order("tg_id").limit(limit)
+        if after_tg_id is not None:
+            query = query.gt("tg_id", after_tg_id)
+        return [row["tg_id"] for row in (query.execute().data or [])]
+
+    def responses_page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        res = (
+            self._client()
+            .table("responses")
+            .select(RESPONSE_COLUMNS)
+            .order("trigger_word")
+            .range(offset, offset + limit - 1)
+            .execute()
+        )
+        return res.data or []
+
+    def get_response(self, trigger_word: str) -> Optional[Dict[str, Any]]:
+        res = (
+            self._client()
+            .table("responses")
+            .select(RESPONSE_COLUMNS)
+            .eq("trigger_word", trigger_word)
+            .maybe_single()
+            .execute()
+        )
+        return res.data if res and res.data else None
+
+    def insert_response(self, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        res = self._client().table("responses").insert(values).execute()
+        return res.data[0] if res.data else None
+
+    def update_response(self, trigger_word: str, values: Dict[str, Any]) -> List[Dict[str, Any]]:
+        res = self._client().table("responses").update(values).eq("trigger_word", trigger_word).execute()
+        return res.data or []
+
+    def delete_response(self, trigger_word: str) -> None:
+        self._client().table("responses").delete().eq("trigger_word", trigger_word).execute()
+
+    def insert_manager(self, tg_id: int, added_by: int) -> None:
+        self._client().table("managers").upsert(
+            {"tg_id": tg_id, "added_by": added_by}, on_conflict="tg_id", ignore_duplicates=True
+        ).execute()
+
+    def delete_manager(self, tg_id: int) -> None:
+        self._client().table("managers").delete().eq("tg_id", tg_id).execute()
+
+    def is_manager(self, tg_id: int) -> bool:
+        res = self._client().table("managers").select("tg_id").eq("tg_id", tg_id).maybe_single().execute()
+        return bool(res and res.data)
+
+    def list_managers(self) -> List[Dict[str, Any]]:
+        return self._client().table("managers").select("tg_id").execute().data or []
+
+    def get_explanation_mode(self) -> bool:
+        res = self._client().table("settings").select("explanation_mode").limit(1).maybe_single().execute()
+        if res and res.data:
+            return bool(res.data.get("explanation_mode", False))
+        return False
+
+    def set_explanation_mode(self, enabled: bool) -> None:
+        client = self._client()
+        res = client.table("settings").select("id, explanation_mode").limit(1).maybe_single().execute()
+        if not res or not res.data:
+            client.table("settings").insert({"explanation_mode": enabled}).execute()
+        else:
+            client.table("settings").update({"explanation_mode": enabled}).eq("id", res.data["id"]).execute()
+
+    def create_broadcast(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        return self._client().table("broadcasts").insert(values).execute().data[0]
+
+    def update_broadcast(self, broadcast_id: int, values: Dict[str, Any]) -> None:
+        self._client().table("broadcasts").update(values).eq("id", broadcast_id).execute()
+
+    def running_broadcasts(self) -> List[Dict[str, Any]]:
+        res = self._client().table("broadcasts").select("*").eq("status", "running").order("id").execute()
+        return res.data or []
+
+
+# Same tables and index names as database/migrations, so one startup check
+# (REQUIRED_INDEXES) covers both backends.
+SQLITE_SCHEMA = """
+create table if not exists users (
+    id integer primary key autoincrement,
+    tg_id integer not null,
+    username text,
+    referral_count integer not null default 0,
+    referred_by integer,
+    join_date text
+);
+create unique index if not exists users_tg_id_key on users (tg_id);
+create index if not exists users_referral_count_idx on users (referral_count desc, tg_id);
+
+create table if not exists referrals (
+    id integer primary key autoincrement,
+    user_id integer not null,
+    referred_user integer not null,
+    created_at text
+);
+create unique index if not exists referrals_user_id_referred_user_key on referrals (user_id, referred_user);
+create index if not exists referrals_user_id_id_idx on referrals (user_id, id);
+
+create table if not exists rewards (
+    id integer primary key autoincrement,
+    tg_id integer not null,
+    created_at text
+);
+create unique index if not exists rewards_tg_id_key on rewards (tg_id);
+
+create table if not exists responses (
+    id integer primary key autoincrement,
+    trigger_word text not null,
+    response_type text not null,
+    content text,
+    file_id text,
+    blob_key text
+);
+create unique index if not exists responses_trigger_word_key on responses (trigger_word);
+
+create table if not exists managers (
+    id integer primary key autoincrement,
+    tg_id integer not null,
+    added_by integer,
+    created_at text
+);
+create unique index if not exists managers_tg_id_key on managers (tg_id);
+
+create table if not exists settings (
+    id integer primary key autoincrement,
+    explanation_mode integer not null default 0
+);
+
+create table if not exists broadcasts (
+    id integer primary key autoincrement,
+    text text not null,
+    admin_chat_id integer not null,
+    status_message_id integer,
+    status text not null default 'running',
+    total integer not null default 0,
+    last_tg_id integer,
+    sent integer not null default 0,
+    blocked integer not null default 0,
+    failed integer not null default 0,
+    created_at text
+);
+create index if not exists broadcasts_running on broadcasts (id) where status = 'running';
+"""
+
+# Columns callers may set through the generic update helpers.
+_RESPONSE_UPDATABLE = frozenset({"response_type", "content", "file_id", "blob_key"})
+_BROADCAST_UPDATABLE = frozenset({"status_message_id", "status", "total", "last_tg_id", "sent", "blocked", "failed"})
+
+
+def _set_clause(values: Dict[str, Any], allowed: Iterable[str]) -> str:
+    unknown = set(values) - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown columns: {sorted(unknown)}")
+    return ", ".join(f"{column} = :{column}" for column in values)
+
+
+class SQLiteRepository(Repository):
+    """Embedded backend: one connection per DB pool thread on a WAL database.
+
+    WAL lets the pool's readers run while a write is in progress; writers
+    queue on SQLite's lock (``busy_timeout``). Statements are parameterised
+    and stay in each connection's prepared-statement cache.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SQLITE_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _one(self, sql: str, params: Any = ()) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(sql, params).fetchone()
+        return dict(row) if row else None
+
+    def _all(self, sql: str, params: Any = ()) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._conn().execute(sql, params).fetchall()]
+
+    def check(self) -> None:
+        names = {row[0] for row in self._conn().execute("select name from sqlite_master where type = 'index'")}
+        _check_schema(None, [name for name in REQUIRED_INDEXES if name not in names])
+
+    def get_user(self, tg_id: int) -> Optional[Dict[str, Any]]:
+        return self._one("select * from users where tg_id = ?", (tg_id,))
+
+    def register_user(
+        self, tg_id: int, username: Optional[str], referrer_id: Optional[int], reward_threshold: int
+    ) -> Dict[str, Any]:
+        conn = self._conn()
+        conn.execute("begin immediate")
+        try:
+            created = conn.execute(
+                "insert into users (tg_id, username, referral_count, referred_by, join_date) "
+                "values (?, ?, 0, ?, ?) on conflict (tg_id) do nothing",
+                (tg_id, username, referrer_id, _utcnow()),
+            ).rowcount == 1
+            result: Dict[str, Any] = {"created": created, "referral_counted": False}
+            if created and referrer_id is not None and referrer_id != tg_id:
+                referrer = conn.execute("select username from users where tg_id = ?", (referrer_id,)).fetchone()
+                if referrer is not None:
+                    count = self._increment_referral(conn, referrer_id, tg_id)
+                    reward = False
+                    if count >= reward_threshold:
+                        reward = conn.execute(
+                            "insert into rewards (tg_id, created_at) values (?, ?) on conflict (tg_id) do nothing",
+                            (referrer_id, _utcnow()),
+                        ).rowcount == 1
+                    result = {
+                        "created": True,
+                        "referral_counted": True,
+                        "referrer_username": referrer["username"],
+                        "referral_count": count,
+                        "reward_granted": reward,
+                    }
+            conn.execute("commit")
+        except BaseException:
+            conn.execute("rollback")
+            raise
+        return result
+
+    @staticmethod
+    def _increment_referral(conn: sqlite3.Connection, referrer_tg_id: int, referred_user_id: int) -> int:
+        inserted = conn.execute(
+            "insert into referrals (user_id, referred_user, created_at) values (?, ?, ?) "
+            "on conflict (user_id, referred_user) do nothing",
+            (referrer_tg_id, referred_user_id, _utcnow()),
+        ).rowcount == 1
+        if inserted:
+            conn.execute("update users set referral_count = referral_count + 1 where tg_id = ?", (referrer_tg_id,))
+        row = conn.execute("select referral_count from users where tg_id = ?", (referrer_tg_id,)).fetchone()
+        return row[0] if row else 0
+
+    def referral_rows(
+        self, tg_id: int, after_id: Optional[int], before_id: Optional[int], limit: int
+    ) -> List[Dict[str, Any]]:
+        if before_id is not None:
+            return self._all(
+                "select id, referred_user from referrals where user_id = ? and id < ? order by id desc limit ?",
+                (tg_id, before_id, limit),
+            )
+        return self._all(
+            "select id, referred_user from referrals where user_id = ? and id > ? order by id limit ?",
+            (tg_id, after_id if after_id is not None else -1, limit),
+        )
+
+    def usernames(self, tg_ids: List[int]) -> Dict[int, Optional[str]]:
+        placeholders = ", ".join("?" * len(tg_ids))
+        rows = self._all(f"select tg_id, username from users where tg_id in ({placeholders})", tg_ids)
+        return {row["tg_id"]: row["username"] for row in rows}
+
+    def top_referrers(self, limit: int) -> List[Dict[str, Any]]:
+        return self._all(
+            "select tg_id, username, referral_count from users order by referral_count desc, tg_id limit ?",
+            (limit,),
+        )
+
+    def referral_counts_page(self, after_tg_id: Optional[int], limit: int) -> List[Dict[str, Any]]:
+        if after_tg_id is None:
+            return self._all("select tg_id, username, referral_count from users order by tg_id limit ?", (limit,))
+        return self._all(
+            "select tg_id, username, referral_count from users where tg_id > ? order by tg_id limit ?",
+            (after_tg_id, limit),
+        )
+
+    def count_users(self) -> int:
+        return self._conn().execute("select count(*) from users").fetchone()[0]
+
+    def user_ids_page(self, after_tg_id: Optional[int], limit: int) -> List[int]:
+        if after_tg_id is None:
+            rows = self._conn().execute("select tg_id from users order by tg_id limit ?", (limit,))
+        else:
+            rows = self._conn().execute(
+                "select tg_id from users where tg_id > ? order by tg_id limit ?", (after_tg_id, limit)
+            )
+        return [row[0] for row in rows.fetchall()]
+
+    def responses_page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        return self._all(
+            f"select {RESPONSE_COLUMNS} from responses order by trigger_word limit ? offset ?", (limit, offset)
+        )
+
+    def get_response(self, trigger_word: str) -> Optional[Dict[str, Any]]:
+        return self._one(f"select {RESPONSE_COLUMNS} from responses where trigger_word = ?", (trigger_word,))
+
+    def insert_response(self, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self._one(
+            "insert into responses (trigger_word, response_type, content, file_id, blob_key) "
+            f"values (:trigger_word, :response_type, :content, :file_id, :blob_key) returning {RESPONSE_COLUMNS}",
+            {"file_id": None, "blob_key": None, **values},
+        )
+
+    def update_response(self, trigger_word: str, values: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self._all(
+            f"update responses set {_set_clause(values, _RESPONSE_UPDATABLE)} "
+            f"where trigger_word = :_trigger returning {RESPONSE_COLUMNS}",
+            {**values, "_trigger": trigger_word},
+        )
+
+    def delete_response(self, trigger_word: str) -> None:
+        self._conn().execute("delete from responses where trigger_word = ?", (trigger_word,))
+
+    def insert_manager(self, tg_id: int, added_by: int) -> None:
+        self._conn().execute(
+            "insert into managers (tg_id, added_by, created_at) values (?, ?, ?) on conflict (tg_id) do nothing",
+            (tg_id, added_by, _utcnow()),
+        )
+
+    def delete_manager(self, tg_id: int) -> None:
+        self._conn().execute("delete from managers where tg_id = ?", (tg_id,))
+
+    def is_manager(self, tg_id: int) -> bool:
+        return self._conn().execute("select 1 from managers where tg_id = ?", (tg_id,)).fetchone() is not None
+
+    def list_managers(self) -> List[Dict[str, Any]]:
+        return self._all("select tg_id from managers order by tg_id")
+
+    def get_explanation_mode(self) -> bool:
+        row = self._conn().execute("select explanation_mode from settings order by id limit 1").fetchone()
+        return bool(row[0]) if row else False
+
+    def set_explanation_mode(self, enabled: bool) -> None:
+        conn = self._conn()
+        row = conn.execute("select id from settings order by id limit 1").fetchone()
+        if row is None:
+            conn.execute("insert into settings (explanation_mode) values (?)", (int(enabled),))
+        else:
+            conn.execute("update settings set explanation_mode = ? where id = ?", (int(enabled), row[0]))
+
+    def create_broadcast(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        return self._one(
+            "insert into broadcasts (text, admin_chat_id, total, status, created_at) "
+            "values (:text, :admin_chat_id, :total, :status, :created_at) returning *",
+            values,
+        )
+
+    def update_broadcast(self, broadcast_id: int, values: Dict[str, Any]) -> None:
+        self._conn().execute(
+            f"update broadcasts set {_set_clause(values, _BROADCAST_UPDATABLE)} where id = :_id",
+            {**values, "_id": broadcast_id},
+        )
+
+    def running_broadcasts(self) -> List[Dict[str, Any]]:
+        return self._all("select * from broadcasts where status = 'running' order by id")
+
+
+_repository: Optional[Repository] = None
+
+
+_repository_lock = threading.Lock()
+
+
+def get_repository() -> Repository:
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                if db_config.backend == "supabase":
+                    _repository = SupabaseRepository()
+                elif db_config.backend == "sqlite":
+                    _repository = SQLiteRepository(db_config.sqlite_path)
+                else:
+                    raise RuntimeError(f"Unknown DB_BACKEND: {db_config.backend!r}")
+    return _repository
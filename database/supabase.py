@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import asyncio
 import base64
-from datetime import datetime
-from typing import Dict, List, Optional, Any
+import functools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
 import os
 import base64
 from supabase import create_client, Client
@@ -10,251 +16,443 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-from config import supabase_config
+from config import cache_config, supabase_config
+from database.cache import CachedValue, managers_cache, responses_cache
+from database.leaderboard import leaderboard
+from database.repository import get_repository
+from utils.metrics import SIZE_BUCKETS, registry
+from utils.text import normalize_text
 
 _supabase_client: Optional[Client] = None
+_client_lock = threading.Lock()
+
+# Repository calls are synchronous (httpx for Supabase, sqlite3 for SQLite), so
+# every query is pushed onto a small dedicated pool instead of blocking the event loop.
+_executor = ThreadPoolExecutor(
+    max_workers=supabase_config.max_workers,
+    thread_name_prefix="supabase",
+)
+
+T = TypeVar("T")
+
+
+DB_CALLS = registry.counter("bot_db_calls_total", "Database helper calls.", ("function", "status"))
+DB_SECONDS = registry.histogram(
+    "bot_db_call_seconds", "Database helper latency, including the wait for a pool thread.", ("function",)
+)
+DB_PAYLOAD = registry.histogram(
+    "bot_db_payload_bytes", "JSON size of the data returned by database helpers.", ("function",), SIZE_BUCKETS
+)
+
+
+def _payload_size(result: Any) -> int:
+    if result is None:
+        return 0
+    return len(json.dumps(result, default=str, separators=(",", ":")).encode())
+
+
+def _measured(func: Callable[..., T], *args: Any, **kwargs: Any) -> Tuple[T, int]:
+    # Runs on the pool thread, so serialising the result never blocks the event loop.
+    result = func(*args, **kwargs)
+    return result, _payload_size(result)
+
+
+def db_call(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    """Turn a blocking repository helper into an awaitable run on the DB pool.
+
+    Every call is counted and timed under the helper's name on ``/metrics``.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result, size = await loop.run_in_executor(
+                _executor, functools.partial(_measured, func, *args, **kwargs)
+            )
+            status = "ok"
+        finally:
+            DB_SECONDS.labels(name).observe(time.perf_counter() - start)
+            DB_CALLS.labels(name, status).inc()
+        DB_PAYLOAD.labels(name).observe(size)
+        return result
+
+    return wrapper
 
 
 def get_client() -> Client:
     global _supabase_client
     if _supabase_client is None:
-        if not supabase_config.url or not supabase_config.key:
-            raise RuntimeError(
-                "Supabase credentials are not configured. Set SUPABASE_URL and SUPABASE_KEY.")
-        _supabase_client = create_client(supabase_config.url, supabase_config.key)
+        # Startup queries arrive on several pool threads at once; create one client only.
+        with _client_lock:
+            if _supabase_client is None:
+                if not supabase_config.url or not supabase_config.key:
+                    raise RuntimeError(
+                        "Supabase credentials are not configured. Set SUPABASE_URL and SUPABASE_KEY.")
+                _supabase_client = create_client(supabase_config.url, supabase_config.key)
     return _supabase_client
 
 
+@db_call
 def init_supabase() -> None:
-    """Create necessary tables if they do not exist.
+    """Fail fast unless the configured backend (``DB_BACKEND``) is usable.
 
-    NOTE: Supabase usually manages schema via SQL migrations, but here we try
-    to ensure a minimal schema using RPC or ignore errors if tables exist.
-    This is a best-effort helper; you can also create tables manually.
+    Supabase must be migrated to the latest database/migrations version
+    (``python -m database.migrate``); the SQLite backend creates its schema
+    on first use. Raises if a hot-path index is missing.
     """
+    get_repository().check()
+
 
-    client = get_client()
+# Users helpers
 
-    # Users table
-    client.table("users").select("id").limit(1).execute()
-    # Referrals table
-    client.table("referrals").select("id").limit(1).execute()
-    # Rewards table
-    client.table("rewards").select("id").limit(1).execute()
-    # Responses table
-    client.table("responses").select("trigger_word").limit(1).execute()
-    # Managers table
-    client.table("managers").select("tg_id").limit(1).execute()
-    # Settings table
-    client.table("settings").select("explanation_mode").limit(1).maybe_single().execute()
+# Referrals needed to earn the reward (an online store).
+REWARD_THRESHOLD = 100
 
 
-# Users helpers
+@db_call
+def _register_user(tg_id: int, username: Optional[str], referrer_id: Optional[int]) -> Dict[str, Any]:
+    return get_repository().register_user(tg_id, username, referrer_id, REWARD_THRESHOLD)
+
 
-def get_or_create_user(tg_id: int, username: Optional[str], referred_by: Optional[int] = None) -> Dict[str, Any]:
-    client = get_client()
-
-    existing = client.table("users").select("*").eq("tg_id", tg_id).maybe_single().execute()
-    if existing and existing.data:
-        user = existing.data
-        user["__created__"] = False
-        return user
-
-    data = {
-        "tg_id": tg_id,
-        "username": username,
-        "referral_count": 0,
-        "referred_by": referred_by,
-        "join_date": datetime.utcnow().isoformat(),
+async def register_user(tg_id: int, username: Optional[str], referrer_id: Optional[int] = None) -> Dict[str, Any]:
+    """Create the user and, for a valid referral, count it and claim the reward.
+
+    Runs the ``register_user`` Postgres function (database/migrations/0004_register_user.sql)
+    in a single round trip, or one SQLite transaction. The result has ``created`` and ``referral_counted``,
+    plus ``referrer_username``, ``referral_count`` and ``reward_granted`` when
+    the referral was counted; ``reward_granted`` is true only the first time.
+    """
+    result = await _register_user(tg_id, username, referrer_id)
+    if result.get("created") and leaderboard.loaded:
+        leaderboard.update(tg_id, 0, username)
+    if result.get("referral_counted") and leaderboard.loaded:
+        leaderboard.update(referrer_id, result.get("referral_count", 0), result.get("referrer_username"))
+    return result
+
+
+@db_call
+def get_user_referrals_page(
+    tg_id: int,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = 20,
+) -> Dict[str, Any]:
+    """One keyset page of the users referred by ``tg_id``, oldest first.
+
+    Pass the ``last_id`` of a page as ``after_id`` for the next page, or its
+    ``first_id`` as ``before_id`` for the previous one. Cost is the same for
+    a user with ten referrals or ten thousand.
+    """
+    repo = get_repository()
+    rows = repo.referral_rows(tg_id, after_id, before_id, limit + 1)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before_id is not None:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after_id is not None, has_more
+
+    names: Dict[int, Optional[str]] = {}
+    if rows:
+        names = repo.usernames([row["referred_user"] for row in rows])
+
+    return {
+        "referrals": [{"tg_id": r["referred_user"], "username": names.get(r["referred_user"])} for r in rows],
+        "first_id": rows[0]["id"] if rows else None,
+        "last_id": rows[-1]["id"] if rows else None,
+        "has_prev": has_prev,
+        "has_next": has_next,
     }
-    inserted = client.table("users").insert(data).execute()
-    user = inserted.data[0]
-    user["__created__"] = True
-    return user
-
-
-def increment_referral(referrer_tg_id: int, referred_user_id: int) -> int:
-    client = get_client()
-
-    # Check if this referral already exists to prevent duplicates
-    existing_ref = (
-        client.table("referrals")
-        .select("id")
-        .eq("user_id", referrer_tg_id)
-        .eq("referred_user", referred_user_id)
-        .maybe_single()
-        .execute()
-    )
-    if existing_ref and existing_ref.data:
-        # Already counted, just return current count
-        user_res = (
-            client.table("users")
-            .select("referral_count")
-            .eq("tg_id", referrer_tg_id)
-            .maybe_single()
-            .execute()
-        )
-        return user_res.data.get("referral_count", 0) if user_res.data else 0
-
-    user_res = (
-        client.table("users")
-        .select("id, referral_count")
-        .eq("tg_id", referrer_tg_id)
-        .maybe_single()
-        .execute()
-    )
-    if not user_res.data:
-        return 0
 
-    user_id = user_res.data["id"]
-    referral_count = (user_res.data.get("referral_count") or 0) + 1
 
-    client.table("users").update({"referral_count": referral_count}).eq("id", user_id).execute()
-    # Store tg_id instead of internal id for easier retrieval
-    client.table("referrals").insert({"user_id": referrer_tg_id, "referred_user": referred_user_id}).execute()
-    return referral_count
+@db_call
+def get_user_stats(tg_id: int) -> Optional[Dict[str, Any]]:
+    return get_repository().get_user(tg_id)
 
 
-def get_user_referrals(tg_id: int) -> List[Dict[str, Any]]:
-    """Get list of users referred by this user with their names."""
-    client = get_client()
-    # Now we can directly query by tg_id since we store it directly
-    res = (
-        client.table("referrals")
-        .select("referred_user")
-        .eq("user_id", tg_id)
-        .execute()
-    )
-    referred_ids = [row["referred_user"] for row in (res.data or [])]
-    if not referred_ids:
-        return []
-
-    # Fetch user details for referred IDs
-    users_res = (
-        client.table("users")
-        .select("tg_id, username")
-        .in_("tg_id", referred_ids)
-        .execute()
-    )
-    return users_res.data or []
+@db_call
+def _fetch_top_referrers(limit: int) -> List[Dict[str, Any]]:
+    return get_repository().top_referrers(limit)
 
 
-def get_user_stats(tg_id: int) -> Optional[Dict[str, Any]]:
-    client = get_client()
-    res = client.table("users").select("*").eq("tg_id", tg_id).single().execute()
-    return res.data
-
-
-def get_top_referrers(limit: int = 10) -> List[Dict[str, Any]]:
-    client = get_client()
-    res = (
-        client.table("users")
-        .select("tg_id, username, referral_count")
-        .order("referral_count", desc=True)
-        .limit(limit)
-        .execute()
-    )
-    return res.data or []
+async def get_top_referrers(limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+    if leaderboard.loaded:
+        return leaderboard.page(offset, limit)
+    return (await _fetch_top_referrers(offset + limit))[offset:]
+
+
+async def get_referral_rank(tg_id: int) -> Optional[int]:
+    """1-based leaderboard position of ``tg_id`` (``None`` if unknown or not loaded)."""
+    return leaderboard.rank(tg_id) if leaderboard.loaded else None
+
+
+_LEADERBOARD_PAGE_SIZE = 1000
+
+
+@db_call
+def _get_all_referral_counts() -> List[Dict[str, Any]]:
+    repo = get_repository()
+    rows: List[Dict[str, Any]] = []
+    after: Optional[int] = None
+    while True:
+        page = repo.referral_counts_page(after, _LEADERBOARD_PAGE_SIZE)
+        rows.extend(page)
+        if len(page) < _LEADERBOARD_PAGE_SIZE:
+            return rows
+        after = page[-1]["tg_id"]
+
+
+async def load_leaderboard() -> int:
+    # Referrals counted while the pages are read are re-applied by replace_all.
+    leaderboard.begin_reload()
+    leaderboard.replace_all(await _get_all_referral_counts())
+    return len(leaderboard)
 
 
 # Responses helpers
+#
+# Trigger lookups are served from ``responses_cache`` once it has been loaded;
+# the write helpers below keep it patched so admins see their edits instantly.
+
+_RESPONSES_PAGE_SIZE = 500
+
+
+@db_call
+def get_all_responses() -> List[Dict[str, Any]]:
+    repo = get_repository()
+    rows: List[Dict[str, Any]] = []
+    start = 0
+    while True:
+        page = repo.responses_page(start, _RESPONSES_PAGE_SIZE)
+        rows.extend(page)
+        if len(page) < _RESPONSES_PAGE_SIZE:
+            return rows
+        start += _RESPONSES_PAGE_SIZE
+
+
+async def load_responses_cache() -> int:
+    """Reload the whole ``responses`` snapshot; returns the number of triggers."""
+    version = responses_cache.version
+    rows = await get_all_responses()
+    if not responses_cache.replace_all(rows, expected_version=version):
+        logger.info("Responses changed during reload, keeping patched cache")
+    return len(responses_cache)
+
+
+@db_call
+def _insert_response(values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return get_repository().insert_response(values)
 
-def add_response(trigger_word: str, response_type: str, content: str) -> None:
-    client = get_client()
-    client.table("responses").insert(
+
+@db_call
+def _delete_response(trigger_word: str) -> None:
+    get_repository().delete_response(trigger_word)
+
+
+@db_call
+def _update_response(trigger_word: str, values: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return get_repository().update_response(trigger_word, values)
+
+
+@db_call
+def _fetch_response(trigger_word: str) -> Optional[Dict[str, Any]]:
+    return get_repository().get_response(normalize_text(trigger_word))
+
+
+def _stored_trigger(trigger_word: str) -> str:
+    """Return the trigger exactly as stored in the DB (cache keys are normalized)."""
+    cached = responses_cache.get(trigger_word)
+    return cached["trigger_word"] if cached else normalize_text(trigger_word)
+
+
+async def add_response(
+    trigger_word: str,
+    response_type: str,
+    content: str,
+    file_id: Optional[str] = None,
+    blob_key: Optional[str] = None,
+) -> None:
+    row = await _insert_response(
         {
-            "trigger_word": trigger_word.lower(),
+            "trigger_word": normalize_text(trigger_word),
             "response_type": response_type,
             "content": content,
+            "file_id": file_id,
+            "blob_key": blob_key,
         }
-    ).execute()
+    )
+    if row:
+        responses_cache.put(row)
+
 
+async def delete_response(trigger_word: str) -> None:
+    await _delete_response(_stored_trigger(trigger_word))
+    responses_cache.discard(trigger_word)
 
-def delete_response(trigger_word: str) -> None:
-    client = get_client()
-    client.table("responses").delete().eq("trigger_word", trigger_word.lower()).execute()
 
+async def update_response_content(
+    trigger_word: str,
+    response_type: str,
+    content: str,
+    file_id: Optional[str] = None,
+    blob_key: Optional[str] = None,
+) -> None:
+    rows = await _update_response(
+        _stored_trigger(trigger_word),
+        {"response_type": response_type, "content": content, "file_id": file_id, "blob_key": blob_key},
+    )
+    for row in rows:
+        responses_cache.put(row)
 
-def update_response_content(trigger_word: str, response_type: str, content: str) -> None:
-    client = get_client()
-    client.table("responses").update(
-        {"response_type": response_type, "content": content}
-    ).eq("trigger_word", trigger_word.lower()).execute()
 
+async def set_response_file_id(trigger_word: str, file_id: Optional[str]) -> None:
+    """Remember the Telegram ``file_id`` of a media response so it is never re-uploaded."""
+    rows = await _update_response(_stored_trigger(trigger_word), {"file_id": file_id})
+    for row in rows:
+        responses_cache.put(row)
 
-def get_response(trigger_word: str) -> Optional[Dict[str, Any]]:
-    client = get_client()
-    res = (
-        client.table("responses")
-        .select("*")
-        .eq("trigger_word", trigger_word.lower())
-        .maybe_single()
-        .execute()
-    )
-    return res.data if res and res.data else None
+
+async def get_response(trigger_word: str) -> Optional[Dict[str, Any]]:
+    if responses_cache.loaded:
+        return responses_cache.get(trigger_word)
+    return await _fetch_response(trigger_word)
+
+
+async def find_responses(text: str) -> List[Dict[str, Any]]:
+    """All responses whose trigger occurs in ``text`` (exact match until the cache is loaded)."""
+    if responses_cache.loaded:
+        return responses_cache.match(text)
+    row = await _fetch_response(text)
+    return [row] if row else []
 
 
 # Managers helpers
+#
+# Manager checks run on every role lookup, so the ids are mirrored in
+# ``managers_cache`` and only re-read from the DB periodically.
+
+@db_call
+def _insert_manager(tg_id: int, added_by: int) -> None:
+    get_repository().insert_manager(tg_id, added_by)
+
+
+async def add_manager(tg_id: int, added_by: int) -> None:
+    await _insert_manager(tg_id, added_by)
+    managers_cache.add(tg_id)
+
+
+@db_call
+def _delete_manager(tg_id: int) -> None:
+    get_repository().delete_manager(tg_id)
+
 
-def add_manager(tg_id: int, added_by: int) -> None:
-    client = get_client()
-    client.table("managers").insert({"tg_id": tg_id, "added_by": added_by}).execute()
+async def remove_manager(tg_id: int) -> None:
+    await _delete_manager(tg_id)
+    managers_cache.discard(tg_id)
 
 
-def remove_manager(tg_id: int) -> None:
-    client = get_client()
-    client.table("managers").delete().eq("tg_id", tg_id).execute()
+@db_call
+def _fetch_is_manager(tg_id: int) -> bool:
+    return get_repository().is_manager(tg_id)
 
 
-def is_manager(tg_id: int) -> bool:
-    client = get_client()
-    res = client.table("managers").select("tg_id").eq("tg_id", tg_id).maybe_single().execute()
-    return bool(res.data)
+async def is_manager(tg_id: int) -> bool:
+    if managers_cache.loaded:
+        return tg_id in managers_cache
+    return await _fetch_is_manager(tg_id)
+
+
+@db_call
+def _fetch_managers() -> List[Dict[str, Any]]:
+    return get_repository().list_managers()
+
+
+async def get_managers() -> List[Dict[str, Any]]:
+    if managers_cache.loaded:
+        return [{"tg_id": tg_id} for tg_id in managers_cache]
+    return await _fetch_managers()
+
+
+async def load_managers_cache() -> int:
+    managers_cache.begin_reload()
+    managers_cache.replace_all(row["tg_id"] for row in await _fetch_managers())
+    return len(managers_cache)
 
 
 # Settings helpers
+#
+# The explanation mode is read for every group message, so it lives in
+# ``explanation_mode_setting`` and the DB is only consulted when it expires.
 
-def get_explanation_mode() -> bool:
-    client = get_client()
-    res = client.table("settings").select("explanation_mode").limit(1).maybe_single().execute()
-    if res and res.data:
-        return bool(res.data.get("explanation_mode", False))
-    return False
+@db_call
+def _fetch_explanation_mode() -> bool:
+    return get_repository().get_explanation_mode()
 
 
-def set_explanation_mode(enabled: bool) -> None:
-    client = get_client()
-    res = client.table("settings").select("id, explanation_mode").limit(1).maybe_single().execute()
-    if not res.data:
-        client.table("settings").insert({"explanation_mode": enabled}).execute()
-    else:
-        client.table("settings").update({"explanation_mode": enabled}).eq("id", res.data["id"]).execute()
+explanation_mode_setting: CachedValue[bool] = CachedValue(
+    _fetch_explanation_mode, ttl=cache_config.settings_ttl_seconds, default=False
+)
+
+
+async def get_explanation_mode() -> bool:
+    return await explanation_mode_setting.get()
+
+
+@db_call
+def _store_explanation_mode(enabled: bool) -> None:
+    get_repository().set_explanation_mode(enabled)
 
 
-# Rewards helpers
+async def set_explanation_mode(enabled: bool) -> None:
+    await _store_explanation_mode(enabled)
+    explanation_mode_setting.set(enabled)
 
-def has_reward_announcement_sent(tg_id: int) -> bool:
-    client = get_client()
-    res = (
-        client.table("rewards")
-        .select("id")
-        .eq("tg_id", tg_id)
-        .maybe_single()
-        .execute()
+
+# Broadcast helpers
+#
+# Mass broadcasts walk ``users`` by tg_id (keyset pagination) and checkpoint
+# their position in ``broadcasts`` so a crashed run resumes where it stopped.
+
+@db_call
+def count_users() -> int:
+    return get_repository().count_users()
+
+
+@db_call
+def get_user_ids_page(after_tg_id: Optional[int], limit: int) -> List[int]:
+    return get_repository().user_ids_page(after_tg_id, limit)
+
+
+@db_call
+def create_broadcast(text: str, admin_chat_id: int, total: int) -> Dict[str, Any]:
+    return get_repository().create_broadcast(
+        {
+            "text": text,
+            "admin_chat_id": admin_chat_id,
+            "total": total,
+            "status": "running",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
     )
-    return bool(res.data)
 
 
-def mark_reward_sent(tg_id: int) -> None:
-    client = get_client()
-    client.table("rewards").insert({"tg_id": tg_id, "created_at": datetime.utcnow().isoformat()}).execute()
+@db_call
+def update_broadcast(broadcast_id: int, values: Dict[str, Any]) -> None:
+    get_repository().update_broadcast(broadcast_id, values)
 
 
-# Utilities for media (base64 encoding/decoding)
+@db_call
+def get_running_broadcasts() -> List[Dict[str, Any]]:
+    return get_repository().running_broadcasts()
 
-def encode_file_to_base64(data: bytes) -> str:
-    return base64.b64encode(data).decode("utf-8")
 
+# Utilities for media (base64 encoding/decoding)
 
 def decode_base64_to_bytes(data: str) -> bytes:
     return base64.b64decode(data.encode("utf-8"))
@@ -1 +1,27 @@
+from aiogram import F, Router
+
+from utils.dispatch import private_buttons
+
 from . import start, referrals, group, admin, responses, support  # noqa: F401
+
+
+def build_router() -> Router:
+    """Root router: updates are split by chat type once, at the top.
+
+    Private messages try the keyboard buttons first (one dict lookup; while a
+    flow waits for input only the admin panel buttons match), then the
+    admin/response FSM flows and /start. Group messages never see any of
+    the private handlers and go straight to handlers/group.py.
+    """
+    private = Router(name="private")
+    private.message.filter(F.chat.type == "private")
+    private_buttons.attach(private.message)
+    private.include_routers(admin.router, responses.router, start.router)
+
+    groups = Router(name="groups")
+    groups.message.filter(F.chat.type.in_({"group", "supergroup"}))
+    groups.include_router(group.router)
+
+    root = Router(name="root")
+    root.include_routers(private, groups)
+    return root
@@ -1,26 +1,32 @@
 from aiogram import Router, F
-from aiogram.types import Message
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 import logging
 
-from config import MAIN_ADMIN_ID, bot_config
+from config import bot_config
 from database.supabase import (
     get_top_referrers,
     get_explanation_mode,
     add_manager,
     remove_manager,
     is_manager,
-    get_client,
+    get_managers,
 )
+from middlewares.auth import ADMIN, RoleFilter
+from utils.broadcast import start_broadcast as start_mass_broadcast
+from utils.dispatch import private_buttons
+from utils.jobs import job_queue
 from utils.keyboards import (
     admin_panel_kb,
+    page_nav_kb,
     responses_manage_kb,
     managers_manage_kb,
     main_menu_kb,
 )
 from utils.states import (
     BroadcastState,
+    MassBroadcastState,
     ManagerAddState,
     ManagerRemoveState,
 )
@@ -31,52 +37,71 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def _is_main_admin(message: Message) -> bool:
-    return bool(message.from_user and message.from_user.id == MAIN_ADMIN_ID)
-
-
-@router.message(F.text == "📂 إدارة الردود الجاهزة")
-async def open_responses_menu(message: Message) -> None:
+@private_buttons("📂 إدارة الردود الجاهزة", during_flows=True)
+async def open_responses_menu(message: Message, role: str) -> None:
     logger.info(f"Admin button pressed: {message.text} from user {message.from_user.id}")
-    if not _is_main_admin(message):
+    if role != ADMIN:
         await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
         return
     await message.answer("📂 اختر العملية المطلوبة:", reply_markup=responses_manage_kb())
 
 
-@router.message(F.text == "👨‍💼 إدارة المدراء")
-async def open_managers_menu(message: Message) -> None:
+@private_buttons("👨‍💼 إدارة المدراء", during_flows=True)
+async def open_managers_menu(message: Message, role: str) -> None:
     logger.info(f"Admin button pressed: {message.text} from user {message.from_user.id}")
-    if not _is_main_admin(message):
+    if role != ADMIN:
         await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
         return
     await message.answer("👨‍💼 إدارة المدراء:", reply_markup=managers_manage_kb())
 
 
-@router.message(F.text == "📊 الإحالات و المكافآت")
-async def show_referrals_and_rewards(message: Message) -> None:
+@private_buttons("📊 الإحالات و المكافآت", during_flows=True)
+async def show_referrals_and_rewards(message: Message, role: str) -> None:
     logger.info(f"Admin button pressed: {message.text} from user {message.from_user.id}")
-    if not _is_main_admin(message):
+    if role != ADMIN:
         await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
         return
 
-    top = get_top_referrers(10)
-    if not top:
-        await message.answer("لا يوجد إحالات مسجّلة بعد.")
-        return
+    text, markup = await _leaderboard_page(0)
+    await message.answer(text, reply_markup=markup)
+
+
+LEADERBOARD_PAGE_SIZE = 10
+
+
+async def _leaderboard_page(page: int) -> tuple[str, InlineKeyboardMarkup | None]:
+    offset = page * LEADERBOARD_PAGE_SIZE
+    # نطلب عنصرًا إضافيًا لمعرفة وجود صفحة تالية
+    rows = await get_top_referrers(LEADERBOARD_PAGE_SIZE + 1, offset=offset)
+    if not rows:
+        return "لا يوجد إحالات مسجّلة بعد.", None
 
     lines = ["📊 أفضل المحيلين:"]
-    for idx, row in enumerate(top, start=1):
+    for idx, row in enumerate(rows[:LEADERBOARD_PAGE_SIZE], start=offset + 1):
         username = row.get("username") or f"ID {row.get('tg_id')}"
         lines.append(f"{idx}. {username} → {row.get('referral_count', 0)} إحالة")
 
-    await message.answer("\n".join(lines))
+    return "\n".join(lines), page_nav_kb(
+        f"lb:{page - 1}" if page > 0 else None,
+        f"lb:{page + 1}" if len(rows) > LEADERBOARD_PAGE_SIZE else None,
+    )
 
 
-@router.message(F.text == "📢 رسالة للمجموعة")
-async def start_broadcast(message: Message, state: FSMContext) -> None:
+@router.callback_query(F.data.startswith("lb:"))
+async def leaderboard_page(callback: CallbackQuery, role: str) -> None:
+    if role != ADMIN:
+        await callback.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.", show_alert=True)
+        return
+
+    text, markup = await _leaderboard_page(int(callback.data.split(":", 1)[1]))
+    await callback.message.edit_text(text, reply_markup=markup)
+    await callback.answer()
+
+
+@private_buttons("📢 رسالة للمجموعة", during_flows=True)
+async def start_broadcast(message: Message, state: FSMContext, role: str) -> None:
     logger.info(f"Admin button pressed: {message.text} from user {message.from_user.id}")
-    if not _is_main_admin(message):
+    if role != ADMIN:
         await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
         return
 
@@ -84,33 +109,56 @@ async def start_broadcast(message: Message, state: FSMContext) -> None:
     await message.answer("✉️ أرسل الآن الرسالة التي تريد إرسالها إلى المجموعة:")
 
 
-@router.message(BroadcastState.waiting_for_text)
+@router.message(BroadcastState.waiting_for_text, RoleFilter(ADMIN))
 async def send_broadcast(message: Message, state: FSMContext) -> None:
-    if not _is_main_admin(message):
-        await state.clear()
-        return
-
     text = (message.text or "").strip()
     if not text:
         await message.answer("❌ الرجاء إرسال نص الرسالة.")
         return
 
-    await message.bot.send_message(
-        chat_id=bot_config.managed_group_id,
+    queued = await job_queue.enqueue(
+        bot_config.managed_group_id,
+        "send_message",
         text=f"📢 رسالة من الإدارة:\n\n{text}",
     )
-    await message.answer("✅ تم إرسال الرسالة إلى المجموعة.")
+    if queued:
+        await message.answer("✅ تمت إضافة الرسالة إلى قائمة الإرسال وستصل إلى المجموعة خلال لحظات.")
+    else:
+        await message.answer("⚠️ قائمة الإرسال ممتلئة حاليًا، حاول بعد قليل.")
+    await state.clear()
+
+
+@private_buttons("📣 رسالة لجميع المستخدمين", during_flows=True)
+async def start_user_broadcast(message: Message, state: FSMContext, role: str) -> None:
+    logger.info(f"Admin button pressed: {message.text} from user {message.from_user.id}")
+    if role != ADMIN:
+        await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
+        return
+
+    await state.set_state(MassBroadcastState.waiting_for_text)
+    await message.answer("✉️ أرسل الآن الرسالة التي تريد إرسالها لجميع مستخدمي البوت:")
+
+
+@router.message(MassBroadcastState.waiting_for_text, RoleFilter(ADMIN))
+async def send_user_broadcast(message: Message, state: FSMContext) -> None:
+    text = (message.text or "").strip()
+    if not text:
+        await message.answer("❌ الرجاء إرسال نص الرسالة.")
+        return
+
     await state.clear()
+    await start_mass_broadcast(message.bot, text, admin_chat_id=message.chat.id)
+    await message.answer("🚀 بدأ الإرسال لجميع المستخدمين، ستصلك تحديثات التقدم هنا.")
 
 
-@router.message(F.text == "⚙️ إعدادات البوت")
-async def show_settings(message: Message) -> None:
+@private_buttons("⚙️ إعدادات البوت", during_flows=True)
+async def show_settings(message: Message, role: str) -> None:
     logger.info(f"Admin button pressed: {message.text} from user {message.from_user.id}")
-    if not _is_main_admin(message):
+    if role != ADMIN:
         await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
         return
 
-    mode = get_explanation_mode()
+    mode = await get_explanation_mode()
     await message.answer(
         "⚙️ إعدادات البوت الحالية:\n"
         f"🧩 وضع الشرح: {'مفعل ✅' if mode else 'متوقف ⛔️'}\n\n"
@@ -119,10 +167,10 @@ async def show_settings(message: Message) -> None:
     )
 
 
-@router.message(F.text == "⬅️ رجوع للقائمة الرئيسية")
-async def back_to_main_menu(message: Message) -> None:
+@private_buttons("⬅️ رجوع للقائمة الرئيسية", during_flows=True)
+async def back_to_main_menu(message: Message, role: str) -> None:
     logger.info(f"Admin button pressed: {message.text} from user {message.from_user.id}")
-    if not _is_main_admin(message):
+    if role != ADMIN:
         await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
         return
 
@@ -135,10 +183,10 @@ async def back_to_main_menu(message: Message) -> None:
 # إدارة المدراء
 
 
-@router.message(F.text == "➕ إضافة مدير")
-async def manager_add_start(message: Message, state: FSMContext) -> None:
+@private_buttons("➕ إضافة مدير", during_flows=True)
+async def manager_add_start(message: Message, state: FSMContext, role: str) -> None:
     logger.info(f"Admin button pressed: {message.text} from user {message.from_user.id}")
-    if not _is_main_admin(message):
+    if role != ADMIN:
         await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
         return
 
@@ -146,26 +194,28 @@ async def manager_add_start(message: Message, state: FSMContext) -> None:
     await message.answer("👤 أرسل الآن آيدي تيليجرام للمدير الجديد (أرقام فقط):")
 
 
-@router.message(ManagerAddState.waiting_for_tg_id)
+@router.message(ManagerAddState.waiting_for_tg_id, RoleFilter(ADMIN))
 async def manager_add_finish(message: Message, state: FSMContext) -> None:
-    if not _is_main_admin(message):
-        await state.clear()
-        return
-
     if not message.text or not message.text.isdigit():
         await message.answer("❌ الرجاء إرسال آيدي صالح (أرقام فقط).")
         return
 
     manager_id = int(message.text)
-    add_manager(manager_id, added_by=message.from_user.id)
+    try:
+        await add_manager(manager_id, added_by=message.from_user.id)
+    except Exception:
+        logger.exception(f"Failed to add manager {manager_id}")
+        await message.answer("❌ تعذّر إضافة المدير، حاول مرة أخرى لاحقاً.")
+        await state.clear()
+        return
     await message.answer(f"✅ تم إضافة المدير: {manager_id}")
     await state.clear()
 
 
-@router.message(F.text == "➖ حذف مدير")
-async def manager_remove_start(message: Message, state: FSMContext) -> None:
+@private_buttons("➖ حذف مدير", during_flows=True)
+async def manager_remove_start(message: Message, state: FSMContext, role: str) -> None:
     logger.info(f"Admin button pressed: {message.text} from user {message.from_user.id}")
-    if not _is_main_admin(message):
+    if role != ADMIN:
         await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
         return
 
@@ -173,32 +223,26 @@ async def manager_remove_start(message: Message, state: FSMContext) -> None:
     await message.answer("🗑 أرسل آيدي المدير الذي تريد حذفه:")
 
 
-@router.message(ManagerRemoveState.waiting_for_tg_id)
+@router.message(ManagerRemoveState.waiting_for_tg_id, RoleFilter(ADMIN))
 async def manager_remove_finish(message: Message, state: FSMContext) -> None:
-    if not _is_main_admin(message):
-        await state.clear()
-        return
-
     if not message.text or not message.text.isdigit():
         await message.answer("❌ الرجاء إرسال آيدي صالح (أرقام فقط).")
         return
 
     manager_id = int(message.text)
-    remove_manager(manager_id)
+    await remove_manager(manager_id)
     await message.answer(f"✅ تم حذف المدير: {manager_id}")
     await state.clear()
 
 
-@router.message(F.text == "📋 قائمة المدراء")
-async def list_managers(message: Message) -> None:
+@private_buttons("📋 قائمة المدراء", during_flows=True)
+async def list_managers(message: Message, role: str) -> None:
     logger.info(f"Admin button pressed: {message.text} from user {message.from_user.id}")
-    if not _is_main_admin(message):
+    if role != ADMIN:
         await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
         return
 
-    client = get_client()
-    res = client.table("managers").select("tg_id").execute()
-    managers = res.data or []
+    managers = await get_managers()
     if not managers:
         await message.answer("لا يوجد مدراء مضافون بعد.")
         return
@@ -1,13 +1,13 @@
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.filters import Command
-from config import MAIN_ADMIN_ID, bot_config
-from database.supabase import get_explanation_mode, set_explanation_mode, is_manager
+from config import bot_config
+from database.supabase import get_explanation_mode, set_explanation_mode
+from middlewares.auth import USER
 from utils.helpers import send_db_response
 import logging
 
 router = Router()
-router.message.filter((F.chat.type == "group") | (F.chat.type == "supergroup"))
 logger = logging.getLogger(__name__)
 
 
@@ -19,16 +19,15 @@ async def group_start(message: Message) -> None:
 
 
 @router.message(F.text == "بسم الله")
-async def enable_explanation_mode(message: Message) -> None:
+async def enable_explanation_mode(message: Message, role: str) -> None:
     logger.info(f"بسم الله from user {message.from_user.id} in group {message.chat.id}")
     if not message.from_user:
         return
-    user_id = message.from_user.id
-    if user_id != MAIN_ADMIN_ID and not is_manager(user_id):
+    if role == USER:
         await message.reply("❌ هذا الأمر متاح فقط للأدمن والمدراء!")
         return
 
-    set_explanation_mode(True)
+    await set_explanation_mode(True)
     try:
         await message.delete()
     except Exception:
@@ -38,16 +37,15 @@ async def enable_explanation_mode(message: Message) -> None:
 
 
 @router.message(F.text == "الحمد لله")
-async def disable_explanation_mode(message: Message) -> None:
+async def disable_explanation_mode(message: Message, role: str) -> None:
     logger.info(f"الحمد لله from user {message.from_user.id} in group {message.chat.id}")
     if not message.from_user:
         return
-    user_id = message.from_user.id
-    if user_id != MAIN_ADMIN_ID and not is_manager(user_id):
+    if role == USER:
         await message.reply("❌ هذا الأمر متاح فقط للأدمن والمدراء!")
         return
 
-    set_explanation_mode(False)
+    await set_explanation_mode(False)
     try:
         await message.delete()
     except Exception:
@@ -65,7 +63,7 @@ async def group_auto_moderation(message: Message) -> None:
     if not text:
         return
 
-    explanation_mode = get_explanation_mode()
+    explanation_mode = await get_explanation_mode()
 
     if explanation_mode:
         # أثناء وضع الشرح: حذف كل الرسائل والرد فقط من قاعدة البيانات
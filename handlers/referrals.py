@@ -1,19 +1,13 @@
-from aiogram import Router, F
 from aiogram.types import Message
 
 from config import bot_config
-from database.supabase import get_user_stats, get_top_referrers
+from database.supabase import get_user_stats
+from utils.dispatch import private_buttons
 
-router = Router()
 
-
-@router.message(F.chat.type == "private")
+@private_buttons("إحالاتي")
 async def show_referral_info(message: Message) -> None:
-    """Optional detailed referral info via buttons in future (reserved)."""
-    if (message.text or "").strip() != "إحالاتي":
-        return
-
-    stats = get_user_stats(message.from_user.id)
+    stats = await get_user_stats(message.from_user.id)
     count = stats.get("referral_count", 0) if stats else 0
     link = f"https://t.me/{bot_config.bot_username.lstrip('@')}?start={message.from_user.id}"
 
@@ -22,9 +16,3 @@ async def show_referral_info(message: Message) -> None:
         f"🔗 رابط الإحالة الخاص بك:\n{link}\n\n"
         f"👥 عدد الإحالات الناجحة: {count}"
     )
-
-
-@router.message((F.chat.type == "supergroup") | (F.chat.type == "group"))
-async def group_referral_announcement(message: Message) -> None:
-    # This router is reserved if we want explicit referral commands in group later.
-    return
@@ -1,19 +1,20 @@
-from io import BytesIO
 import logging
 
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import Message
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 
-from config import MAIN_ADMIN_ID
+from config import blob_config
 from database.supabase import (
     add_response,
     delete_response,
     update_response_content,
     get_response,
-    encode_file_to_base64,
 )
+from database.blobs import BlobWriter, MediaTooLarge, put_blob_file
+from middlewares.auth import ADMIN, RoleFilter
+from utils.dispatch import private_buttons
 from utils.keyboards import response_type_kb
 from utils.states import AddResponseState, DeleteResponseState, EditResponseState
 
@@ -21,17 +22,13 @@ router = Router()
 logger = logging.getLogger(__name__)
 
 
-def _is_main_admin(message: Message) -> bool:
-    return bool(message.from_user and message.from_user.id == MAIN_ADMIN_ID)
-
-
 # إضافة رد جديد
 
 
-@router.message(F.text == "➕ إضافة رد جديد")
-async def add_response_start(message: Message, state: FSMContext) -> None:
+@private_buttons("➕ إضافة رد جديد")
+async def add_response_start(message: Message, state: FSMContext, role: str) -> None:
     logger.info(f"Response button pressed: {message.text} from user {message.from_user.id}")
-    if not _is_main_admin(message):
+    if role != ADMIN:
         await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
         return
 
@@ -39,18 +36,14 @@ async def add_response_start(message: Message, state: FSMContext) -> None:
     await message.answer("📝 أرسل الكلمة أو العبارة المحفّزة للرد:")
 
 
-@router.message(AddResponseState.waiting_for_trigger)
+@router.message(AddResponseState.waiting_for_trigger, RoleFilter(ADMIN))
 async def add_response_set_trigger(message: Message, state: FSMContext) -> None:
-    if not _is_main_admin(message):
-        await state.clear()
-        return
-
     trigger = (message.text or "").strip().lower()
     if not trigger:
         await message.answer("❌ الرجاء إرسال كلمة صالحة.")
         return
 
-    if get_response(trigger):
+    if await get_response(trigger):
         await message.answer("⚠️ هذا الرد موجود بالفعل، يمكنك تعديله من قائمة التعديل.")
         await state.clear()
         return
@@ -75,12 +68,8 @@ def _map_type_label(label: str) -> str | None:
     return mapping.get(label)
 
 
-@router.message(AddResponseState.waiting_for_type)
+@router.message(AddResponseState.waiting_for_type, RoleFilter(ADMIN))
 async def add_response_set_type(message: Message, state: FSMContext) -> None:
-    if not _is_main_admin(message):
-        await state.clear()
-        return
-
     label = (message.text or "").strip()
     rtype = _map_type_label(label)
     if not rtype:
@@ -104,12 +93,40 @@ async def add_response_set_type(message: Message, state: FSMContext) -> None:
         await message.answer("📎 أرسل الآن الملف المطلوب:")
 
 
-@router.message(AddResponseState.waiting_for_content)
-async def add_response_save(message: Message, state: FSMContext) -> None:
-    if not _is_main_admin(message):
-        await state.clear()
-        return
+def _find_media(message: Message, rtype: str):
+    if rtype == "photo" and message.photo:
+        return message.photo[-1]
+    if rtype == "video" and message.video:
+        return message.video
+    if rtype == "audio" and (message.audio or message.voice):
+        return message.audio or message.voice
+    if rtype == "document" and message.document:
+        return message.document
+    return None
+
+
+async def _store_media(message: Message, file_obj) -> str | None:
+    """تنزيل الملف على دفعات مباشرة إلى مخزن الملفات دون تحميله كاملًا في الذاكرة."""
+    max_mb = blob_config.max_media_size // (1024 * 1024)
+    too_large = f"❌ حجم الملف أكبر من الحد المسموح ({max_mb} ميغابايت)."
 
+    if (file_obj.file_size or 0) > blob_config.max_media_size:
+        await message.answer(too_large)
+        return None
+
+    writer = BlobWriter(blob_config.max_media_size)
+    try:
+        await message.bot.download(file_obj, destination=writer, seek=False)
+        return await put_blob_file(writer)
+    except MediaTooLarge:
+        await message.answer(too_large)
+        return None
+    finally:
+        writer.discard()
+
+
+@router.message(AddResponseState.waiting_for_content, RoleFilter(ADMIN))
+async def add_response_save(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
     trigger = data.get("trigger_word")
     rtype = data.get("response_type")
@@ -120,6 +137,8 @@ async def add_response_save(message: Message, state: FSMContext) -> None:
         return
 
     content_str: str | None = None
+    file_id: str | None = None
+    blob_key: str | None = None
 
     if rtype in ("text", "link"):
         if not message.text:
@@ -127,27 +146,18 @@ async def add_response_save(message: Message, state: FSMContext) -> None:
             return
         content_str = message.text
     else:
-        file_obj = None
-        if rtype == "photo" and message.photo:
-            file_obj = message.photo[-1]
-        elif rtype == "video" and message.video:
-            file_obj = message.video
-        elif rtype == "audio" and (message.audio or message.voice):
-            file_obj = message.audio or message.voice
-        elif rtype == "document" and message.document:
-            file_obj = message.document
-
+        file_obj = _find_media(message, rtype)
         if not file_obj:
             await message.answer("❌ لم يتم العثور على ملف مناسب، حاول مرة أخرى.")
             return
 
-        buf = BytesIO()
-        await message.bot.download(file_obj, destination=buf)
-        buf.seek(0)
-        content_bytes = buf.read()
-        content_str = encode_file_to_base64(content_bytes)
+        blob_key = await _store_media(message, file_obj)
+        if not blob_key:
+            return
+        content_str = ""
+        file_id = file_obj.file_id
 
-    add_response(trigger, rtype, content_str)
+    await add_response(trigger, rtype, content_str, file_id=file_id, blob_key=blob_key)
     await message.answer("✅ تم حفظ الرد بنجاح.")
     await state.clear()
 
@@ -155,10 +165,10 @@ async def add_response_save(message: Message, state: FSMContext) -> None:
 # حذف رد
 
 
-@router.message(F.text == "🗑 حذف رد")
-async def delete_response_start(message: Message, state: FSMContext) -> None:
+@private_buttons("🗑 حذف رد")
+async def delete_response_start(message: Message, state: FSMContext, role: str) -> None:
     logger.info(f"Response button pressed: {message.text} from user {message.from_user.id}")
-    if not _is_main_admin(message):
+    if role != ADMIN:
         await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
         return
 
@@ -166,23 +176,19 @@ async def delete_response_start(message: Message, state: FSMContext) -> None:
     await message.answer("🗑 أرسل الكلمة المحفزة للرد الذي تريد حذفه:")
 
 
-@router.message(DeleteResponseState.waiting_for_trigger)
+@router.message(DeleteResponseState.waiting_for_trigger, RoleFilter(ADMIN))
 async def delete_response_finish(message: Message, state: FSMContext) -> None:
-    if not _is_main_admin(message):
-        await state.clear()
-        return
-
     trigger = (message.text or "").strip().lower()
     if not trigger:
         await message.answer("❌ الرجاء إرسال كلمة صالحة.")
         return
 
-    if not get_response(trigger):
+    if not await get_response(trigger):
         await message.answer("❌ لم يتم العثور على رد بهذه الكلمة.")
         await state.clear()
         return
 
-    delete_response(trigger)
+    await delete_response(trigger)
     await message.answer("✅ تم حذف الرد.")
     await state.clear()
 
@@ -190,10 +196,10 @@ async def delete_response_finish(message: Message, state: FSMContext) -> None:
 # تعديل رد
 
 
-@router.message(F.text == "✏️ تعديل رد")
-async def edit_response_start(message: Message, state: FSMContext) -> None:
+@private_buttons("✏️ تعديل رد")
+async def edit_response_start(message: Message, state: FSMContext, role: str) -> None:
     logger.info(f"Response button pressed: {message.text} from user {message.from_user.id}")
-    if not _is_main_admin(message):
+    if role != ADMIN:
         await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
         return
 
@@ -201,18 +207,14 @@ async def edit_response_start(message: Message, state: FSMContext) -> None:
     await message.answer("✏️ أرسل الكلمة المحفزة للرد الذي تريد تعديله:")
 
 
-@router.message(EditResponseState.waiting_for_trigger)
+@router.message(EditResponseState.waiting_for_trigger, RoleFilter(ADMIN))
 async def edit_response_choose_type(message: Message, state: FSMContext) -> None:
-    if not _is_main_admin(message):
-        await state.clear()
-        return
-
     trigger = (message.text or "").strip().lower()
     if not trigger:
         await message.answer("❌ الرجاء إرسال كلمة صالحة.")
         return
 
-    if not get_response(trigger):
+    if not await get_response(trigger):
         await message.answer("❌ لم يتم العثور على رد بهذه الكلمة.")
         await state.clear()
         return
@@ -225,12 +227,8 @@ async def edit_response_choose_type(message: Message, state: FSMContext) -> None
     )
 
 
-@router.message(EditResponseState.waiting_for_type)
+@router.message(EditResponseState.waiting_for_type, RoleFilter(ADMIN))
 async def edit_response_set_type(message: Message, state: FSMContext) -> None:
-    if not _is_main_admin(message):
-        await state.clear()
-        return
-
     label = (message.text or "").strip()
     rtype = _map_type_label(label)
     if not rtype:
@@ -254,12 +252,8 @@ async def edit_response_set_type(message: Message, state: FSMContext) -> None:
         await message.answer("📎 أرسل الآن الملف الجديد:")
 
 
-@router.message(EditResponseState.waiting_for_content)
+@router.message(EditResponseState.waiting_for_content, RoleFilter(ADMIN))
 async def edit_response_save(message: Message, state: FSMContext) -> None:
-    if not _is_main_admin(message):
-        await state.clear()
-        return
-
     data = await state.get_data()
     trigger = data.get("trigger_word")
     rtype = data.get("response_type")
@@ -270,6 +264,8 @@ async def edit_response_save(message: Message, state: FSMContext) -> None:
         return
 
     content_str: str | None = None
+    file_id: str | None = None
+    blob_key: str | None = None
 
     if rtype in ("text", "link"):
         if not message.text:
@@ -277,26 +273,17 @@ async def edit_response_save(message: Message, state: FSMContext) -> None:
             return
         content_str = message.text
     else:
-        file_obj = None
-        if rtype == "photo" and message.photo:
-            file_obj = message.photo[-1]
-        elif rtype == "video" and message.video:
-            file_obj = message.video
-        elif rtype == "audio" and (message.audio or message.voice):
-            file_obj = message.audio or message.voice
-        elif rtype == "document" and message.document:
-            file_obj = message.document
-
+        file_obj = _find_media(message, rtype)
         if not file_obj:
             await message.answer("❌ لم يتم العثور على ملف مناسب، حاول مرة أخرى.")
             return
 
-        buf = BytesIO()
-        await message.bot.download(file_obj, destination=buf)
-        buf.seek(0)
-        content_bytes = buf.read()
-        content_str = encode_file_to_base64(content_bytes)
+        blob_key = await _store_media(message, file_obj)
+        if not blob_key:
+            return
+        content_str = ""
+        file_id = file_obj.file_id
 
-    update_response_content(trigger, rtype, content_str)
+    await update_response_content(trigger, rtype, content_str, file_id=file_id, blob_key=blob_key)
     await message.answer("✅ تم تحديث الرد بنجاح.")
     await state.clear()
@@ -1,17 +1,20 @@
-from aiogram import Router, F
-from aiogram.types import Message
 import logging
 
+from aiogram import Router, F
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message, User
+
 from config import bot_config
-from utils.keyboards import main_menu_kb
-from database.supabase import get_or_create_user, increment_referral
-from database.supabase import has_reward_announcement_sent, mark_reward_sent
+from utils.keyboards import main_menu_kb, page_nav_kb
+from database.supabase import register_user
+from middlewares.auth import ADMIN
+from utils.dispatch import private_buttons
+from utils.jobs import job_queue
 
 router = Router()
 logger = logging.getLogger(__name__)
 
 
-@router.message(F.chat.type == "private", F.text.startswith("/start"))
+@router.message(F.text.startswith("/start"))
 async def start_private(message: Message) -> None:
     """Handle any private message (no text commands, only buttons-based navigation).
 
@@ -28,35 +31,7 @@ async def start_private(message: Message) -> None:
         if payload.isdigit():
             referrer_id = int(payload)
 
-    user = get_or_create_user(tg_id=tg_id, username=username, referred_by=referrer_id)
-    is_new = bool(user.get("__created__"))
-
-    # If referral is valid, not self-referral, and this is a new user -> count referral
-    if referrer_id and referrer_id != tg_id and is_new:
-        from database.supabase import get_user_stats
-
-        new_count = increment_referral(referrer_id, user["id"])
-
-        ref_stats = get_user_stats(referrer_id) or {}
-        ref_username = ref_stats.get("username") or str(referrer_id)
-        new_username = username or str(tg_id)
-
-        await message.bot.send_message(
-            chat_id=bot_config.managed_group_id,
-            text=f"🎉 إحالة جديدة! 🌟\n\n"
-                 f"👤 العضو: @{new_username}\n"
-                 f"🤝 بواسطة: @{ref_username}\n"
-                 f"🔢 إجمالي إحالات @{ref_username}: {new_count}\n\n"
-                 f"🚀 استمر في النجاح! 💪"
-        )
-
-        if new_count >= 100 and not has_reward_announcement_sent(referrer_id):
-            await message.bot.send_message(
-                chat_id=bot_config.managed_group_id,
-                text=f"🏆 مبروك @{ref_username}! تحصلت على الجائزة (متجر إلكتروني جاهز) 🎉",
-            )
-            mark_reward_sent(referrer_id)
-
+    # الرد على المستخدم أولًا، ثم تسجيل الإحالة بطلب واحد للقاعدة
     text = (
         "🔹 مرحبًا بك في بوت Arinas Helper!\n\n"
         "⚙️ استخدم الأزرار الموجودة في الأسفل للتنقل في البوت 🌟\n"
@@ -65,8 +40,44 @@ async def start_private(message: Message) -> None:
 
     await message.answer(text, reply_markup=main_menu_kb(tg_id))
 
+    result = await register_user(tg_id, username, referrer_id)
+    if not result.get("referral_counted"):
+        return
+
+    ref_username = result.get("referrer_username") or str(referrer_id)
+    new_username = username or str(tg_id)
+    new_count = result.get("referral_count", 0)
+
+    # الإعلانات تُرسل في الخلفية وبالترتيب، دون انتظار حدود تيليجرام
+    await job_queue.enqueue(
+        bot_config.managed_group_id,
+        "send_message",
+        text=f"🎉 إحالة جديدة! 🌟\n\n"
+             f"👤 العضو: @{new_username}\n"
+             f"🤝 بواسطة: @{ref_username}\n"
+             f"🔢 إجمالي إحالات @{ref_username}: {new_count}\n\n"
+             f"🚀 استمر في النجاح! 💪",
+    )
+    if result.get("reward_granted"):
+        # الجائزة سُجلت في القاعدة ولن تُمنح مرة أخرى، لذا نتابع نتيجة الإعلان دون انتظارها
+        def report_reward(delivered: bool) -> None:
+            if not delivered:
+                logger.error(
+                    f"Reward for @{ref_username} ({referrer_id}) is recorded but its announcement "
+                    f"could not be sent to the group; announce it manually"
+                )
+
+        queued = await job_queue.enqueue(
+            bot_config.managed_group_id,
+            "send_message",
+            on_done=report_reward,
+            text=f"🏆 مبروك @{ref_username}! تحصلت على الجائزة (متجر إلكتروني جاهز) 🎉",
+        )
+        if not queued:
+            report_reward(False)
+
 
-@router.message(F.chat.type == "private", F.text == "🌐 رابط المجموعة")
+@private_buttons("🌐 رابط المجموعة")
 async def handle_group_link(message: Message) -> None:
     logger.info(f"Group link button from user {message.from_user.id}")
     await message.answer(
@@ -75,7 +86,7 @@ async def handle_group_link(message: Message) -> None:
         "نحن هنا لندعمك ونحقق معًا أهدافك! 💪🔥")
 
 
-@router.message(F.chat.type == "private", F.text == "💬 الدعم الفني")
+@private_buttons("💬 الدعم الفني")
 async def handle_support(message: Message) -> None:
     logger.info(f"Support button from user {message.from_user.id}")
     support_username = bot_config.support_username.lstrip('@')
@@ -86,7 +97,7 @@ async def handle_support(message: Message) -> None:
     )
 
 
-@router.message(F.chat.type == "private", F.text == "🔗 رابط الإحالة الخاص بي")
+@private_buttons("🔗 رابط الإحالة الخاص بي")
 async def handle_referral_link(message: Message) -> None:
     logger.info(f"Referral link button from user {message.from_user.id}")
     tg_id = message.from_user.id
@@ -98,7 +109,7 @@ async def handle_referral_link(message: Message) -> None:
     )
 
 
-@router.message(F.chat.type == "private", F.text == "📜 قانون المجموعة")
+@private_buttons("📜 قانون المجموعة")
 async def handle_group_rules(message: Message) -> None:
     logger.info(f"Rules button from user {message.from_user.id}")
     await message.answer(
@@ -109,44 +120,91 @@ async def handle_group_rules(message: Message) -> None:
     )
 
 
-@router.message(F.chat.type == "private", F.text == "🧮 إحصائياتي")
-async def handle_stats(message: Message) -> None:
-    logger.info(f"Stats button from user {message.from_user.id}")
-    tg_id = message.from_user.id
-    from database.supabase import get_user_stats, get_user_referrals
+REFERRALS_PAGE_SIZE = 20
+
+
+async def _render_stats(
+    user: User, after_id: int | None = None, before_id: int | None = None
+) -> tuple[str, InlineKeyboardMarkup | None] | None:
+    """نص الإحصائيات مع صفحة واحدة من قائمة الإحالات وأزرار التنقل."""
+    from database.supabase import get_user_stats, get_user_referrals_page
 
-    stats = get_user_stats(tg_id)
+    stats = await get_user_stats(user.id)
     if not stats:
-        await message.answer("لم يتم العثور على بياناتك بعد.")
-        return
-    
-    referrals = get_user_referrals(tg_id)
+        return None
+
+    count = stats.get("referral_count", 0)
+    page = {"referrals": []}
+    if count:
+        page = await get_user_referrals_page(
+            user.id, after_id=after_id, before_id=before_id, limit=REFERRALS_PAGE_SIZE
+        )
+
     referral_names = []
-    for ref in referrals:
+    for ref in page["referrals"]:
         name = ref.get("username")
         if name:
             referral_names.append(f"@{name}")
         else:
             referral_names.append(f"مستخدم {ref['tg_id']}")
-    
+
     names_text = "\n".join(referral_names) if referral_names else "لا توجد إحالات بعد"
-    
-    await message.answer(
+
+    text = (
         "🧮 إحصائياتك:\n\n"
-        f"👤 المعرف: @{message.from_user.username or 'بدون'}\n"
-        f"🔗 عدد الإحالات الناجحة: {stats.get('referral_count', 0)}\n\n"
+        f"👤 المعرف: @{user.username or 'بدون'}\n"
+        f"🔗 عدد الإحالات الناجحة: {count}\n\n"
         f"👥 قائمة إحالاتك:\n{names_text}\n\n"
         f"💡 يمكنك رؤية أسماء المستخدمين الذين أحالتهم أعلاه!"
     )
+    # بدون مؤشر لا يوجد ما نتنقل إليه، فلا نعرض الزر
+    first_id, last_id = page.get("first_id"), page.get("last_id")
+    markup = page_nav_kb(
+        f"refs:p:{first_id}" if page.get("has_prev") and first_id is not None else None,
+        f"refs:n:{last_id}" if page.get("has_next") and last_id is not None else None,
+    )
+    return text, markup
 
 
-@router.message(F.chat.type == "private", F.text == "🎁 المكافآت")
+@private_buttons("🧮 إحصائياتي")
+async def handle_stats(message: Message) -> None:
+    logger.info(f"Stats button from user {message.from_user.id}")
+
+    rendered = await _render_stats(message.from_user)
+    if not rendered:
+        await message.answer("لم يتم العثور على بياناتك بعد.")
+        return
+
+    text, markup = rendered
+    await message.answer(text, reply_markup=markup)
+
+
+@router.callback_query(F.data.startswith("refs:"))
+async def handle_stats_page(callback: CallbackQuery) -> None:
+    _, direction, cursor = (callback.data.split(":", 2) + ["", ""])[:3]
+    if direction not in ("n", "p") or not cursor.isdigit():
+        # زر قديم أو تالف: نتجاهله بدلًا من إسقاط المعالج
+        await callback.answer()
+        return
+
+    if direction == "n":
+        rendered = await _render_stats(callback.from_user, after_id=int(cursor))
+    else:
+        rendered = await _render_stats(callback.from_user, before_id=int(cursor))
+
+    if rendered:
+        text, markup = rendered
+        await callback.message.edit_text(text, reply_markup=markup)
+    await callback.answer()
+
+
+@private_buttons("🎁 المكافآت")
 async def handle_rewards(message: Message) -> None:
     logger.info(f"Rewards button from user {message.from_user.id}")
     tg_id = message.from_user.id
     from database.supabase import get_user_stats
 
-    stats = get_user_stats(tg_id)
+    stats = await get_user_stats(tg_id)
     count = stats.get("referral_count", 0) if stats else 0
     status = "✅ مؤهل" if count >= 100 else "❌ غير مؤهل بعد"
     await message.answer(
@@ -158,13 +216,34 @@ async def handle_rewards(message: Message) -> None:
     )
 
 
-@router.message(F.chat.type == "private", F.text == "🧰 لوحة التحكم")
-async def handle_admin_panel(message: Message) -> None:
+@private_buttons("🏅 ترتيبي")
+async def handle_my_rank(message: Message) -> None:
+    logger.info(f"Rank button from user {message.from_user.id}")
+    from database.supabase import get_referral_rank, get_top_referrers
+
+    rank = await get_referral_rank(message.from_user.id)
+    if rank is None:
+        await message.answer("لم يتم العثور على ترتيبك بعد، حاول لاحقًا.")
+        return
+
+    top = await get_top_referrers(3)
+    podium = "\n".join(
+        f"{medal} {row.get('username') or 'ID ' + str(row['tg_id'])} → {row.get('referral_count', 0)}"
+        for medal, row in zip(("🥇", "🥈", "🥉"), top)
+    )
+    await message.answer(
+        "🏅 ترتيبك في الإحالات:\n\n"
+        f"📍 مركزك الحالي: {rank}\n\n"
+        f"🏆 المتصدرون:\n{podium}"
+    )
+
+
+@private_buttons("🧰 لوحة التحكم")
+async def handle_admin_panel(message: Message, role: str) -> None:
     logger.info(f"Admin panel button from user {message.from_user.id}")
-    from config import MAIN_ADMIN_ID
     from utils.keyboards import admin_panel_kb
 
-    if message.from_user.id != MAIN_ADMIN_ID:
+    if role != ADMIN:
         await message.answer("❌ هذه الميزة متاحة فقط للأدمن الرئيسي.")
         return
     await message.answer("🧰 لوحة تحكم الأدمن الرئيسي:", reply_markup=admin_panel_kb())
@@ -1,17 +1,13 @@
-from aiogram import Router, F
 from aiogram.types import Message
 
 from config import bot_config
+from utils.dispatch import private_buttons
 
-router = Router()
-router.message.filter(F.chat.type == "private")
 
-
-@router.message()
+@private_buttons("دعم")
 async def support_info(message: Message) -> None:
     # معلومات بسيطة عن الدعم، الردود المتقدمة تتم عبر الأزرار في start.py
-    if (message.text or "").strip() == "دعم":
-        await message.answer(
-            "💬 للتواصل مع الدعم الفني:\n"
-            f"{bot_config.support_username}"
-        )
+    await message.answer(
+        "💬 للتواصل مع الدعم الفني:\n"
+        f"{bot_config.support_username}"
+    )
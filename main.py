@@ -1,42 +1,163 @@
 import asyncio
 import logging
+from typing import Optional
 
-from aiogram import Bot, Dispatcher
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
-from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import BOT_TOKEN
-from handlers import start, referrals, group, admin, responses, support
-from database.supabase import init_supabase
+from config import BOT_TOKEN, cache_config, metrics_config, ratelimit_config, scheduler_config, webhook_config
+from handlers import build_router
+from database.cache import refresh_periodically
+from database.fsm_storage import create_fsm_storage
+from database.supabase import (
+    get_explanation_mode,
+    init_supabase,
+    load_leaderboard,
+    load_managers_cache,
+    load_responses_cache,
+)
+from middlewares.auth import RoleMiddleware
+from middlewares.metrics import ApiMetricsMiddleware, HandlerMetricsMiddleware, UpdateMetricsMiddleware
+from middlewares.ratelimit import RateLimitMiddleware
+from utils.broadcast import resume_broadcasts
+from utils.dispatch import private_buttons
+from utils.jobs import job_queue
+from utils.ratelimit import create_limiter
+from utils.scheduler import ScheduledDispatcher, update_scheduler
+from utils.startup import run_concurrently, startup
+from utils.webserver import add_webhook_handler, create_app, set_webhook, start_web_server
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+async def _warm_up(bot: Optional[Bot]) -> None:
+    try:
+        ranked = await startup.phase("leaderboard", load_leaderboard())
+        logger.info(f"Loaded {ranked} users into the referral leaderboard")
+    except Exception:
+        # The leaderboard falls back to the DB and is reloaded periodically.
+        logger.exception("Loading the referral leaderboard failed")
+    if bot is not None:
+        try:
+            resumed = await startup.phase("broadcasts", resume_broadcasts(bot))
+            logger.info(f"Resumed {resumed} interrupted broadcasts")
+        except Exception:
+            logger.exception("Resuming interrupted broadcasts failed; they resume on the next restart")
+    startup.log_warm()
+
+
+async def load_data(bot: Optional[Bot] = None, wait_for_warmup: bool = True) -> Optional[asyncio.Task]:
+    """Check the database and warm the caches, all concurrently.
+
+    Returns once what every update needs is in place: the schema check, the
+    Bot API (when ``bot`` is given), responses, managers and settings. The
+    leaderboard pages through every user and already falls back to the DB,
+    so unless ``wait_for_warmup`` it keeps loading in the returned task.
+    """
+    # bot.me() caches the result, so polling does not ask again.
+    bot_probe = [startup.phase("bot_api", bot.me())] if bot is not None else []
+    # The schema check goes first so its error is the one reported if several fail.
+    _, responses, managers, *_ = await run_concurrently(
+        startup.phase("database", init_supabase()),
+        startup.phase("responses", load_responses_cache()),
+        startup.phase("managers", load_managers_cache()),
+        startup.phase("settings", get_explanation_mode()),
+        *bot_probe,
+    )
+    logger.info(f"Loaded {responses} responses into cache")
+    logger.info(f"Loaded {managers} managers")
+
+    warmup = asyncio.create_task(_warm_up(bot))
+    if wait_for_warmup:
+        await warmup
+        return None
+    return warmup
+
+
+def create_bot(session: Optional[BaseSession] = None) -> Bot:
+    bot = Bot(token=BOT_TOKEN, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    # Latency and error counts for every outgoing Bot API request.
+    bot.session.middleware(ApiMetricsMiddleware())
+    return bot
+
+
+def create_dispatcher() -> ScheduledDispatcher:
+    """The production dispatcher: middlewares and routers (also used by benchmarks/loadtest.py)."""
+    # Updates are handled concurrently across chats and in order within a chat.
+    dp = ScheduledDispatcher(scheduler=update_scheduler, storage=create_fsm_storage())
+    # Latency/count metrics for updates and individual handlers.
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    # Resolve the sender's role once per update (from memory) for handlers and RoleFilter.
+    dp.update.outer_middleware(RoleMiddleware())
+    # Flood protection for private chats: bursts of PRIVATE_RATE_BURST, then PRIVATE_RATE_LIMIT per second.
+    dp.message.outer_middleware(
+        RateLimitMiddleware(
+            create_limiter("private", rate=ratelimit_config.private_rate, capacity=ratelimit_config.private_burst)
+        )
+    )
+
+    dp.include_router(build_router())
+    logger.info(f"All routers registered successfully ({len(private_buttons)} keyboard buttons)!")
+    return dp
+
+
 async def main() -> None:
-    # Initialize Supabase client and ensure tables exist
-    init_supabase()
-
-    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-    dp = Dispatcher(storage=MemoryStorage())
-
-    # Register routers - admin first to catch admin commands
-    logger.info("Registering admin router...")
-    dp.include_router(admin.router)
-    logger.info("Registering responses router...")
-    dp.include_router(responses.router)
-    logger.info("Registering start router...")
-    dp.include_router(start.router)
-    logger.info("Registering referrals router...")
-    dp.include_router(referrals.router)
-    logger.info("Registering group router...")
-    dp.include_router(group.router)
-    logger.info("Registering support router...")
-    dp.include_router(support.router)
-    logger.info("All routers registered successfully!")
-
-    await dp.start_polling(bot)
+    bot = create_bot()
+    dp = create_dispatcher()
+
+    # Listen right away so /healthz and /readyz answer during a cold start.
+    # Updates that reach a webhook left over from the last deploy simply wait
+    # in the scheduler until it starts.
+    web_runner = None
+    if webhook_config.mode == "webhook" or metrics_config.enabled:
+        app = create_app()
+        if webhook_config.mode == "webhook":
+            add_webhook_handler(app, dp, bot)
+        web_runner = await startup.phase("web_server", start_web_server(app))
+
+    background = [
+        asyncio.create_task(
+            refresh_periodically(load_responses_cache, cache_config.responses_refresh_seconds, "responses")
+        ),
+        asyncio.create_task(
+            refresh_periodically(load_leaderboard, cache_config.leaderboard_refresh_seconds, "leaderboard")
+        ),
+        asyncio.create_task(
+            refresh_periodically(load_managers_cache, cache_config.managers_refresh_seconds, "managers")
+        ),
+        asyncio.create_task(update_scheduler.report_periodically(scheduler_config.report_interval)),
+    ]
+    try:
+        prepare = [startup.phase("job_queue", job_queue.start(bot))]
+        if webhook_config.mode != "webhook":
+            # A webhook left over from a previous deployment would make getUpdates fail.
+            prepare.append(startup.phase("delete_webhook", bot.delete_webhook()))
+        warmup, *_ = await run_concurrently(load_data(bot, wait_for_warmup=False), *prepare)
+        background.append(warmup)
+
+        update_scheduler.start()
+        if webhook_config.mode == "webhook":
+            await startup.phase("set_webhook", set_webhook(dp, bot))
+            startup.mark_ready()
+            await asyncio.Event().wait()
+        else:
+            startup.mark_ready()
+            # feed_update only queues the update, so polling can await it; a full
+            # backlog then pauses getUpdates instead of piling up tasks.
+            await dp.start_polling(bot, handle_as_tasks=False)
+    finally:
+        for task in background:
+            task.cancel()
+        await update_scheduler.stop()
+        if web_runner is not None:
+            await web_runner.cleanup()
+        await job_queue.stop()
+        await bot.session.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,46 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.filters import BaseFilter
+from aiogram.types import TelegramObject, User
+
+from config import MAIN_ADMIN_ID
+from database.supabase import is_manager
+
+ADMIN = "admin"
+MANAGER = "manager"
+USER = "user"
+
+
+async def resolve_role(user: User | None) -> str:
+    if user is None:
+        return USER
+    if user.id == MAIN_ADMIN_ID:
+        return ADMIN
+    # Served from the in-memory managers set once it is loaded.
+    if await is_manager(user.id):
+        return MANAGER
+    return USER
+
+
+class RoleMiddleware(BaseMiddleware):
+    """Put the sender's ``role`` ("admin", "manager" or "user") into handler data."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        data["role"] = await resolve_role(data.get("event_from_user"))
+        return await handler(event, data)
+
+
+class RoleFilter(BaseFilter):
+    """Match only senders whose ``role`` (set by ``RoleMiddleware``) is one of ``roles``."""
+
+    def __init__(self, *roles: str) -> None:
+        self.roles = frozenset(roles)
+
+    async def __call__(self, event: TelegramObject, role: str = USER) -> bool:
+        return role in self.roles
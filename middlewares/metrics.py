@@ -0,0 +1,100 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.methods import TelegramMethod
+from aiogram.types import Message, TelegramObject, Update
+
+from utils.dispatch import ButtonTable
+from utils.metrics import registry
+
+UPDATES = registry.counter("bot_updates_total", "Updates processed.", ("type", "handled"))
+UPDATE_SECONDS = registry.histogram(
+    "bot_update_seconds", "Time from dispatch to the end of the handler, per update.", ("type",)
+)
+HANDLER_CALLS = registry.counter("bot_handler_calls_total", "Handler calls.", ("router", "handler", "status"))
+HANDLER_SECONDS = registry.histogram("bot_handler_seconds", "Handler latency.", ("router", "handler"))
+API_CALLS = registry.counter("bot_telegram_api_calls_total", "Bot API requests.", ("method", "status"))
+API_SECONDS = registry.histogram("bot_telegram_api_seconds", "Bot API request latency.", ("method",))
+
+
+def handler_labels(handler: Optional[HandlerObject], event: TelegramObject) -> Tuple[str, str]:
+    """``(router, handler)`` labels: the handler's module and function name.
+
+    Keyboard buttons are all served by one ``ButtonTable`` handler, so they are
+    reported under the button's own handler instead.
+    """
+    if handler is None:
+        return "unknown", "unknown"
+    callback = handler.callback
+    table = getattr(callback, "__self__", None)
+    if isinstance(table, ButtonTable) and isinstance(event, Message):
+        callback = table.resolve(event.text) or callback
+    module = getattr(callback, "__module__", None) or "unknown"
+    return module.rsplit(".", 1)[-1], getattr(callback, "__name__", "unknown")
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer ``dp.update`` middleware: counts and times every update by type."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        event_type = event.event_type
+        start = time.perf_counter()
+        result = UNHANDLED
+        try:
+            result = await handler(event, data)
+            return result
+        finally:
+            UPDATE_SECONDS.labels(event_type).observe(time.perf_counter() - start)
+            UPDATES.labels(event_type, "no" if result is UNHANDLED else "yes").inc()
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware: latency histogram and call count per router/handler."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        router, name = handler_labels(data.get("handler"), event)
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = await handler(event, data)
+            status = "ok"
+            return result
+        finally:
+            HANDLER_SECONDS.labels(router, name).observe(time.perf_counter() - start)
+            HANDLER_CALLS.labels(router, name, status).inc()
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Bot session middleware timing every outgoing Telegram API request."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ) -> Any:
+        name = type(method).__name__
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            API_SECONDS.labels(name).observe(time.perf_counter() - start)
+            API_CALLS.labels(name, status).inc()
@@ -0,0 +1,40 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message, TelegramObject
+
+from utils.ratelimit import RateLimiter
+
+
+def private_user_key(event: TelegramObject) -> Optional[str]:
+    """Throttle each user in private chat; group messages are never dropped here."""
+    if isinstance(event, Message) and event.chat.type == "private" and event.from_user:
+        return f"user:{event.from_user.id}"
+    return None
+
+
+class RateLimitMiddleware(BaseMiddleware):
+    """Drop events whose key has run out of budget in ``limiter``.
+
+    ``key_func`` maps an event to a limiter key, or ``None`` to let it through
+    unconditionally.
+    """
+
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        key_func: Callable[[TelegramObject], Optional[str]] = private_user_key,
+    ) -> None:
+        self.limiter = limiter
+        self.key_func = key_func
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        key = self.key_func(event)
+        if key is not None and not await self.limiter.hit(key):
+            return None
+        return await handler(event, data)
@@ -0,0 +1,35 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from database import fsm_storage
+from database.fsm_storage import SQLiteStorage
+
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+
+
+def test_write_after_expiry_does_not_revive_old_data(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(fsm_storage.time, "time", lambda: clock[0])
+
+    async def scenario():
+        storage = SQLiteStorage(str(tmp_path / "fsm.db"), ttl=60)
+        try:
+            await storage.set_state(KEY, "A:x")
+            await storage.set_data(KEY, {"trigger_word": "old"})
+            clock[0] += 61
+            assert await storage.get_data(KEY) == {}
+
+            await storage.set_state(KEY, "B:y")
+            assert await storage.get_state(KEY) == "B:y"
+            assert await storage.get_data(KEY) == {}
+
+            await storage.set_data(KEY, {"trigger_word": "new"})
+            clock[0] += 61
+            await storage.set_data(KEY, {"trigger_word": "newer"})
+            assert await storage.get_state(KEY) is None
+            assert await storage.get_data(KEY) == {"trigger_word": "newer"}
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,159 @@
+"""Rate-limit-aware broadcast of one message to every user.
+
+Users are streamed from the DB in keyset-paginated pages. Sends go through a
+global token bucket (Telegram allows roughly 30 messages per second per bot)
+plus a per-chat bucket, with ``BROADCAST_CONCURRENCY`` requests in flight.
+A ``RetryAfter`` pauses every sender until Telegram's flood wait is over.
+After each page the cursor and counters are checkpointed in ``broadcasts``,
+so a run interrupted by a crash or deploy resumes from the last page on the
+next start (users on the unfinished page may get the message twice).
+The admin's status message is edited with progress, throughput and ETA.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramRetryAfter
+
+from config import broadcast_config
+from database.supabase import (
+    count_users,
+    create_broadcast,
+    get_running_broadcasts,
+    get_user_ids_page,
+    update_broadcast,
+)
+from utils.ratelimit import create_limiter
+
+logger = logging.getLogger(__name__)
+
+_global_limiter = create_limiter("broadcast", rate=broadcast_config.rate, capacity=broadcast_config.rate)
+_chat_limiter = create_limiter("broadcast_chat", rate=1, capacity=1)
+
+# Keeps running broadcasts referenced so they are not garbage-collected.
+_tasks: Set[asyncio.Task] = set()
+
+# A flood wait applies to the whole bot: after a RetryAfter no sender of any
+# broadcast calls Telegram again before this ``time.monotonic()`` value.
+_resume_at = 0.0
+
+
+async def _flood_wait() -> None:
+    while (delay := _resume_at - time.monotonic()) > 0:
+        await asyncio.sleep(delay)
+
+
+class Broadcast:
+    def __init__(self, bot: Bot, row: Dict[str, Any]) -> None:
+        self.bot = bot
+        self.id = row["id"]
+        self.text = row["text"]
+        self.admin_chat_id = row["admin_chat_id"]
+        self.status_message_id = row.get("status_message_id")
+        self.total = row.get("total") or 0
+        self.cursor = row.get("last_tg_id")
+        self.sent = row.get("sent") or 0
+        self.blocked = row.get("blocked") or 0
+        self.failed = row.get("failed") or 0
+        self._started = time.monotonic()
+        self._done_at_start = self.done
+        self._last_report = 0.0
+        self._semaphore = asyncio.Semaphore(broadcast_config.concurrency)
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.blocked + self.failed
+
+    async def run(self) -> None:
+        try:
+            while True:
+                ids = await get_user_ids_page(self.cursor, broadcast_config.page_size)
+                if not ids:
+                    break
+                await asyncio.gather(*(self._deliver(chat_id) for chat_id in ids))
+                self.cursor = ids[-1]
+                await update_broadcast(self.id, self._checkpoint())
+                await self._report()
+        except Exception:
+            logger.exception(f"Broadcast {self.id} stopped, it will resume on next start")
+            raise
+        await update_broadcast(self.id, {**self._checkpoint(), "status": "done"})
+        await self._report(final=True)
+
+    def _checkpoint(self) -> Dict[str, Any]:
+        return {"last_tg_id": self.cursor, "sent": self.sent, "blocked": self.blocked, "failed": self.failed}
+
+    async def _deliver(self, chat_id: int) -> None:
+        global _resume_at
+        async with self._semaphore:
+            while True:
+                await _global_limiter.wait("global")
+                await _chat_limiter.wait(str(chat_id))
+                await _flood_wait()
+                try:
+                    await self.bot.send_message(chat_id=chat_id, text=self.text)
+                    self.sent += 1
+                    return
+                except TelegramRetryAfter as e:
+                    _resume_at = max(_resume_at, time.monotonic() + e.retry_after)
+                except TelegramForbiddenError:
+                    # Blocked the bot or deactivated account.
+                    self.blocked += 1
+                    return
+                except TelegramAPIError as e:
+                    logger.info(f"Broadcast {self.id}: failed to reach {chat_id}: {e}")
+                    self.failed += 1
+                    return
+
+    async def _report(self, final: bool = False) -> None:
+        now = time.monotonic()
+        if not final and now - self._last_report < broadcast_config.report_interval:
+            return
+        self._last_report = now
+
+        elapsed = max(now - self._started, 1e-6)
+        rate = (self.done - self._done_at_start) / elapsed
+        remaining = max(self.total - self.done, 0)
+        eta = f"{int(remaining / rate // 60)} د {int(remaining / rate % 60)} ث" if rate > 0 else "—"
+        header = "✅ اكتمل الإرسال لجميع المستخدمين" if final else "📣 جارٍ الإرسال لجميع المستخدمين..."
+        text = (
+            f"{header}\n\n"
+            f"📬 تم الإرسال: {self.sent} / {self.total}\n"
+            f"🚫 حظروا البوت: {self.blocked}\n"
+            f"⚠️ فشل: {self.failed}\n"
+            f"⚡️ السرعة: {rate:.1f} رسالة/ث\n"
+            f"⏳ الوقت المتبقي: {'0' if final else eta}"
+        )
+        try:
+            if self.status_message_id:
+                await self.bot.edit_message_text(text, chat_id=self.admin_chat_id, message_id=self.status_message_id)
+            else:
+                msg = await self.bot.send_message(self.admin_chat_id, text)
+                self.status_message_id = msg.message_id
+                await update_broadcast(self.id, {"status_message_id": msg.message_id})
+        except TelegramAPIError as e:
+            logger.info(f"Broadcast {self.id}: could not update progress: {e}")
+
+
+def _spawn(bot: Bot, row: Dict[str, Any]) -> None:
+    task = asyncio.create_task(Broadcast(bot, row).run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def start_broadcast(bot: Bot, text: str, admin_chat_id: int) -> None:
+    total = await count_users()
+    row = await create_broadcast(text, admin_chat_id, total)
+    _spawn(bot, row)
+
+
+async def resume_broadcasts(bot: Bot) -> int:
+    rows = await get_running_broadcasts()
+    for row in rows:
+        logger.info(f"Resuming broadcast {row['id']} after tg_id {row.get('last_tg_id')}")
+        _spawn(bot, row)
+    return len(rows)
@@ -0,0 +1,75 @@
+"""Exact-text routing for reply-keyboard buttons.
+
+aiogram tries a router's handlers one after another, so a menu built from
+``@router.message(F.text == label)`` handlers evaluates every label filter
+for every message that is not a button press. Buttons registered on a
+``ButtonTable`` share one handler instead: its filter is a single dict
+membership test and the target is picked with one lookup.
+
+    @private_buttons("🌐 رابط المجموعة")
+    async def handle_group_link(message: Message) -> None: ...
+
+Button handlers receive the same keyword arguments (``state``, ``role``,
+``bot``...) as ordinary aiogram handlers.
+
+While an FSM flow is waiting for input the text belongs to the flow: a
+trigger or broadcast that happens to equal a label is not taken as a button
+press. Only labels registered with ``during_flows=True`` (the admin panel's
+own navigation, which lets an admin leave a flow) still match then.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional, Set
+
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.types import Message
+
+
+class ButtonTable:
+    def __init__(self) -> None:
+        self._handlers: Dict[str, CallableObject] = {}
+        # Labels that are buttons even while an FSM state is set.
+        self._during_flows: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._handlers)
+
+    def __contains__(self, text: str) -> bool:
+        return text in self._handlers
+
+    def __call__(self, *labels: str, during_flows: bool = False) -> Callable:
+        """Register the decorated handler for each of ``labels``."""
+
+        def decorator(callback: Callable) -> Callable:
+            handler = CallableObject(callback)
+            for label in labels:
+                if label in self._handlers:
+                    raise ValueError(f"Button {label!r} is already registered")
+                self._handlers[label] = handler
+                if during_flows:
+                    self._during_flows.add(label)
+            return callback
+
+        return decorator
+
+    def resolve(self, text: Optional[str]) -> Optional[Callable]:
+        """Handler a button press with ``text`` is routed to, if any."""
+        handler = self._handlers.get(text)
+        return handler.callback if handler else None
+
+    def attach(self, observer: TelegramEventObserver) -> None:
+        """Serve the table from ``observer`` (normally a router's ``message``)."""
+        observer.register(self._dispatch, self._is_button)
+
+    def _is_button(self, message: Message, raw_state: Optional[str] = None) -> bool:
+        if message.text not in self._handlers:
+            return False
+        return raw_state is None or message.text in self._during_flows
+
+    async def _dispatch(self, message: Message, **data: Any) -> Any:
+        return await self._handlers[message.text].call(message, **data)
+
+
+# أزرار لوحات المفاتيح في المحادثات الخاصة
+private_buttons = ButtonTable()
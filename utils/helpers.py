@@ -1,39 +1,67 @@
-import time
-from typing import Dict, Tuple
+import logging
+from typing import Any, Dict, Optional
 
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import Message
 from aiogram.types.input_file import BufferedInputFile
 
-from database.supabase import get_response, decode_base64_to_bytes
+from database.blobs import get_blob
+from database.supabase import find_responses, decode_base64_to_bytes, set_response_file_id
+from utils.ratelimit import create_limiter
+from utils.text import normalize_text
 
+logger = logging.getLogger(__name__)
 
-_last_trigger_times: Dict[Tuple[int, str], float] = {}
 
+# نفس الكلمة من نفس العضو: مرة كل 5 ثوانٍ
+_trigger_limiter = create_limiter("trigger", rate=1 / 5, capacity=1)
+# كل عضو: 5 ردود متتالية ثم رد كل 3 ثوانٍ
+_user_limiter = create_limiter("user", rate=1 / 3, capacity=5)
+# كل مجموعة: 20 ردًا في الدقيقة، وهو حد تيليجرام لإرسال البوت في المجموعات
+_chat_limiter = create_limiter("chat", rate=20 / 60, capacity=20)
 
-def is_spam(user_id: int, trigger: str, window_seconds: float = 5.0) -> bool:
-    """منع التكرار السريع لنفس الكلمة من نفس العضو."""
-    now = time.time()
-    key = (user_id, trigger.lower())
-    last = _last_trigger_times.get(key)
-    if last and now - last < window_seconds:
-        return True
-    _last_trigger_times[key] = now
+
+async def is_spam(chat_id: int, user_id: int, trigger: str) -> bool:
+    """منع التكرار السريع لنفس الكلمة من نفس العضو، مع حد لكل عضو ولكل مجموعة."""
+    budgets = (
+        (_trigger_limiter, f"{user_id}:{normalize_text(trigger)}"),
+        (_user_limiter, str(user_id)),
+        (_chat_limiter, str(chat_id)),
+    )
+    taken = []
+    for limiter, key in budgets:
+        if not await limiter.hit(key):
+            # الرد لن يُرسل، فنُعيد ما استُهلك من الحدود السابقة
+            for used, used_key in taken:
+                await used.refund(used_key)
+            return True
+        taken.append((limiter, key))
     return False
 
 
-async def send_db_response(message: Message, trigger: str) -> bool:
-    """إرسال الرد المناسب من قاعدة البيانات إذا وُجد."""
-    trigger = (trigger or "").strip().lower()
-    if not trigger or not message.from_user:
-        return False
+# أقصى عدد من الردود لرسالة واحدة تحتوي على عدة كلمات محفّزة
+MAX_RESPONSES_PER_MESSAGE = 3
 
-    if is_spam(message.from_user.id, trigger):
-        return False
 
-    resp = get_response(trigger)
-    if not resp:
+async def send_db_response(message: Message, text: str) -> bool:
+    """إرسال الردود المناسبة لكل كلمة محفّزة تظهر داخل الرسالة."""
+    text = (text or "").strip()
+    if not text or not message.from_user:
         return False
 
+    # الردود محفوظة في الذاكرة، فالرسائل بدون كلمات محفّزة لا تكلّف أي طلب للقاعدة
+    matches = await find_responses(text)
+
+    sent_any = False
+    for resp in matches[:MAX_RESPONSES_PER_MESSAGE]:
+        if await is_spam(message.chat.id, message.from_user.id, resp.get("trigger_word") or ""):
+            continue
+        if await _send_response(message, resp):
+            sent_any = True
+    return sent_any
+
+
+async def _send_response(message: Message, resp: Dict[str, Any]) -> bool:
     rtype = resp.get("response_type")
     content = resp.get("content") or ""
 
@@ -41,16 +69,51 @@ async def send_db_response(message: Message, trigger: str) -> bool:
         await message.answer(content)
         return True
 
-    if rtype in ("photo", "video", "audio", "document"):
-        data = decode_base64_to_bytes(content)
-        if rtype == "photo":
-            await message.answer_photo(BufferedInputFile(data, filename="image.jpg"))
-        elif rtype == "video":
-            await message.answer_video(BufferedInputFile(data, filename="video.mp4"))
-        elif rtype == "audio":
-            await message.answer_audio(BufferedInputFile(data, filename="audio.mp3"))
-        else:
-            await message.answer_document(BufferedInputFile(data, filename="file.bin"))
-        return True
+    if rtype in _MEDIA_SENDERS:
+        return await _send_media(message, rtype, resp)
 
     return False
+
+
+# نوع الرد ← (دالة الإرسال، اسم الملف عند الرفع)
+_MEDIA_SENDERS = {
+    "photo": ("answer_photo", "image.jpg"),
+    "video": ("answer_video", "video.mp4"),
+    "audio": ("answer_audio", "audio.mp3"),
+    "document": ("answer_document", "file.bin"),
+}
+
+
+def _sent_file_id(sent: Message, rtype: str) -> Optional[str]:
+    if rtype == "photo":
+        return sent.photo[-1].file_id if sent.photo else None
+    media = getattr(sent, rtype, None)
+    return media.file_id if media else None
+
+
+async def _send_media(message: Message, rtype: str, resp: Dict[str, Any]) -> bool:
+    """إرسال الوسائط عبر file_id المحفوظ، والرجوع للملف المخزّن فقط إذا رفضه تيليجرام."""
+    method_name, filename = _MEDIA_SENDERS[rtype]
+    send = getattr(message, method_name)
+
+    file_id = resp.get("file_id")
+    if file_id:
+        try:
+            await send(file_id)
+            return True
+        except TelegramBadRequest as e:
+            logger.warning(f"file_id rejected for trigger {resp.get('trigger_word')!r}: {e}")
+
+    if resp.get("blob_key"):
+        data = await get_blob(resp["blob_key"])
+    elif resp.get("content"):
+        # ردود قديمة لم تُنقل بعد إلى مخزن الملفات
+        data = decode_base64_to_bytes(resp["content"])
+    else:
+        return False
+
+    sent = await send(BufferedInputFile(data, filename=filename))
+    new_file_id = _sent_file_id(sent, rtype)
+    if new_file_id and new_file_id != file_id:
+        await set_response_file_id(resp["trigger_word"], new_file_id)
+    return True
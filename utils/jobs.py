@@ -0,0 +1,201 @@
+"""Background queue for fire-and-forget Telegram sends.
+
+Handlers call ``await job_queue.enqueue(chat_id, "send_message", text=...)``
+and return immediately; worker tasks perform the call later.
+
+* Jobs for the same chat run strictly in the order they were enqueued, while
+  different chats are served in parallel by ``JOBS_WORKERS`` workers
+  (a ``KeyedQueue`` from utils/keyed_queue.py keyed by chat).
+* ``TelegramRetryAfter`` waits exactly as long as Telegram asks; network and
+  5xx errors are retried with exponential backoff up to ``max_attempts``.
+* The backlog is bounded: ``enqueue`` refuses new jobs once it is full.
+* ``stop`` lets the backlog drain for a few seconds before cancelling the
+  workers; ``on_done`` of the jobs left behind is called with ``False``.
+* ``enqueue(..., on_done=callback)`` reports the outcome of a job without
+  waiting for it, for sends that must not be lost silently (the reward
+  announcement).
+* With ``JOBS_BACKEND=sqlite`` every job is written to disk first and removed
+  after it ran, so anything still queued is resumed after a restart.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from config import jobs_config
+from utils.keyed_queue import KeyedQueue
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    chat_id: int
+    method: str
+    params: Dict[str, Any]
+    id: Optional[int] = None
+    attempts: int = 0
+    # Resolved with the outcome when ``enqueue`` got ``on_done``; not persisted.
+    done: Optional[asyncio.Future] = None
+
+
+class SQLiteJobStore:
+    """Write-ahead log of queued jobs; blocking, used from a single thread."""
+
+    def __init__(self, path: str) -> None:
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL, "
+            "method TEXT NOT NULL, params TEXT NOT NULL)"
+        )
+
+    def add(self, job: Job) -> int:
+        cur = self._conn.execute(
+            "INSERT INTO jobs (chat_id, method, params) VALUES (?, ?, ?)",
+            (job.chat_id, job.method, json.dumps(job.params, ensure_ascii=False)),
+        )
+        return cur.lastrowid
+
+    def remove(self, job_id: int) -> None:
+        self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def pending(self) -> List[Job]:
+        rows = self._conn.execute("SELECT id, chat_id, method, params FROM jobs ORDER BY id").fetchall()
+        return [Job(chat_id=r[1], method=r[2], params=json.loads(r[3]), id=r[0]) for r in rows]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class JobQueue:
+    def __init__(
+        self,
+        workers: int,
+        max_backlog: int,
+        max_attempts: int = 5,
+        store: Optional[SQLiteJobStore] = None,
+    ) -> None:
+        self.workers = workers
+        self.max_backlog = max_backlog
+        self.max_attempts = max_attempts
+        self._store = store
+        self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs") if store else None
+        self._bot: Optional[Bot] = None
+        self._queue: KeyedQueue[Job] = KeyedQueue(self._handle, workers, "Job")
+        # Outcomes not reported yet, failed by ``stop``.
+        self._deliveries: Set[asyncio.Future] = set()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    async def enqueue(
+        self, chat_id: int, method: str, on_done: Optional[Callable[[bool], None]] = None, **params: Any
+    ) -> bool:
+        """Queue ``bot.<method>(chat_id=chat_id, **params)``; ``False`` if the backlog is full.
+
+        ``on_done`` is called once the job has run, with ``True`` only if
+        Telegram accepted it. It is not called when ``enqueue`` returns ``False``.
+        """
+        job = Job(chat_id=chat_id, method=method, params=params)
+        if on_done is not None:
+            job.done = asyncio.get_running_loop().create_future()
+            job.done.add_done_callback(lambda done: on_done(done.exception() is None and done.result()))
+        if not await self._add(job):
+            return False
+        if job.done is not None:
+            self._deliveries.add(job.done)
+            job.done.add_done_callback(self._deliveries.discard)
+        return True
+
+    async def _add(self, job: Job) -> bool:
+        if len(self._queue) >= self.max_backlog:
+            logger.warning(f"Job backlog full ({len(self._queue)}), dropping {job.method} to {job.chat_id}")
+            return False
+        if self._store:
+            job.id = await self._store_call(self._store.add, job)
+        self._queue.push(job.chat_id, job)
+        return True
+
+    async def start(self, bot: Bot) -> None:
+        self._bot = bot
+        if self._store:
+            for job in await self._store_call(self._store.pending):
+                self._queue.push(job.chat_id, job)
+            if len(self._queue):
+                logger.info(f"Resuming {len(self._queue)} queued jobs")
+        self._queue.start()
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Give queued jobs ``timeout`` seconds to run, then cancel the workers."""
+        deadline = time.monotonic() + timeout
+        while len(self._queue) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if len(self._queue):
+            kept = "they resume on next start" if self._store else "they are lost"
+            logger.warning(f"Dropping {len(self._queue)} queued jobs on shutdown; {kept}")
+        await self._queue.stop()
+        for done in list(self._deliveries):
+            if not done.done():
+                done.set_exception(RuntimeError("Job queue stopped before the job ran"))
+        if self._store:
+            await self._store_call(self._store.close)
+            self._store_executor.shutdown(wait=True)
+
+    async def _store_call(self, func, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._store_executor, func, *args)
+
+    async def _handle(self, job: Job) -> None:
+        sent = False
+        try:
+            sent = await self._run(job)
+        except Exception:
+            logger.exception(f"Job {job.method} to {job.chat_id} crashed")
+        if job.done is not None and not job.done.done():
+            job.done.set_result(sent)
+        if job.id is not None:
+            await self._store_call(self._store.remove, job.id)
+
+    async def _run(self, job: Job) -> bool:
+        call = getattr(self._bot, job.method)
+        while True:
+            try:
+                await call(chat_id=job.chat_id, **job.params)
+                return True
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                job.attempts += 1
+                if job.attempts >= self.max_attempts:
+                    logger.error(f"Giving up on {job.method} to {job.chat_id} after {job.attempts} attempts: {e}")
+                    return False
+                await asyncio.sleep(min(2 ** job.attempts, 60))
+            except TelegramAPIError as e:
+                logger.warning(f"Dropping {job.method} to {job.chat_id}: {e}")
+                return False
+
+
+job_queue = JobQueue(
+    workers=jobs_config.workers,
+    max_backlog=jobs_config.max_backlog,
+    store=SQLiteJobStore(jobs_config.sqlite_path) if jobs_config.backend == "sqlite" else None,
+)
+
+registry.gauge("bot_job_backlog", "Background sends waiting to run.", lambda: len(job_queue))
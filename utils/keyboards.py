@@ -1,4 +1,9 @@
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
+from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    KeyboardButton,
+    ReplyKeyboardMarkup,
+)
 
 from config import MAIN_ADMIN_ID
 
@@ -17,6 +22,7 @@ def main_menu_kb(user_id: int) -> ReplyKeyboardMarkup:
             KeyboardButton(text="🧮 إحصائياتي"),
             KeyboardButton(text="🎁 المكافآت"),
         ],
+        [KeyboardButton(text="🏅 ترتيبي")],
     ]
 
     if user_id == MAIN_ADMIN_ID:
@@ -35,6 +41,7 @@ def admin_panel_kb() -> ReplyKeyboardMarkup:
         [KeyboardButton(text="👨‍💼 إدارة المدراء")],
         [KeyboardButton(text="📊 الإحالات و المكافآت")],
         [KeyboardButton(text="📢 رسالة للمجموعة")],
+        [KeyboardButton(text="📣 رسالة لجميع المستخدمين")],
         [KeyboardButton(text="⚙️ إعدادات البوت")],
         [KeyboardButton(text="⬅️ رجوع للقائمة الرئيسية")],
     ]
@@ -66,3 +73,13 @@ def managers_manage_kb() -> ReplyKeyboardMarkup:
         [KeyboardButton(text="⬅️ رجوع للوحة التحكم")],
     ]
     return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
+
+
+def page_nav_kb(prev_data: str | None, next_data: str | None) -> InlineKeyboardMarkup | None:
+    """Previous/next inline buttons; pass ``None`` to hide a direction."""
+    row = []
+    if prev_data:
+        row.append(InlineKeyboardButton(text="⬅️ السابق", callback_data=prev_data))
+    if next_data:
+        row.append(InlineKeyboardButton(text="التالي ➡️", callback_data=next_data))
+    return InlineKeyboardMarkup(inline_keyboard=[row]) if row else None
@@ -0,0 +1,82 @@
+"""Per-key ordered work queue shared by the update scheduler and the job queue.
+
+Items are pushed under a key (a chat id). ``KeyedQueue`` then guarantees:
+
+* Items with the same key are handled strictly one after another, in push
+  order.
+* Different keys are handled in parallel by ``workers`` tasks.
+* After each item a busy key goes to the back of the line instead of being
+  drained, so one chat with a long backlog cannot starve the others.
+
+Backpressure, persistence and statistics are left to the owner, which does
+them in its ``handle`` callback.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Generic, Hashable, List, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class KeyedQueue(Generic[T]):
+    def __init__(self, handle: Callable[[T], Awaitable[None]], workers: int, name: str) -> None:
+        self.handle = handle
+        self.workers = workers
+        self.name = name
+        # Each key is in ``_ready`` at most once, so only one worker ever runs its items.
+        self._pending: Dict[Hashable, Deque[T]] = {}
+        self._ready: asyncio.Queue[Hashable] = asyncio.Queue()
+        self._size = 0
+        self.running = 0
+        self._tasks: List[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        """Items queued or being handled."""
+        return self._size
+
+    @property
+    def keys(self) -> int:
+        """Keys with queued or running items."""
+        return len(self._pending)
+
+    def push(self, key: Hashable, item: T) -> None:
+        queue = self._pending.get(key)
+        if queue is None:
+            queue = self._pending[key] = deque()
+            self._ready.put_nowait(key)
+        queue.append(item)
+        self._size += 1
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._ready.get()
+            queue = self._pending[key]
+            self.running += 1
+            try:
+                await self.handle(queue[0])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"{self.name} item for {key} crashed")
+            finally:
+                self.running -= 1
+            queue.popleft()
+            self._size -= 1
+            if queue:
+                self._ready.put_nowait(key)
+            else:
+                del self._pending[key]
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class TriggerMatcher:
+    """Aho-Corasick automaton that finds every trigger in a text in one pass.
+
+    Adding or removing a pattern only edits the trie; the failure/output links
+    are recomputed lazily (linear in the trie size) before the next search, so
+    a burst of admin edits costs a single rebuild.
+    Matches must sit on word boundaries: "سلام" fires inside "السلام عليكم"
+    only if written as a separate word.
+    """
+
+    def __init__(self, patterns: Iterable[str] = ()) -> None:
+        self.reset(patterns)
+
+    def reset(self, patterns: Iterable[str] = ()) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._terminal: List[Optional[str]] = [None]
+        self._fail: List[int] = [0]
+        self._out: List[int] = [0]
+        self._dirty = False
+        for pattern in patterns:
+            self.add(pattern)
+
+    def __contains__(self, pattern: str) -> bool:
+        node = self._walk(pattern)
+        return node is not None and self._terminal[node] is not None
+
+    def add(self, pattern: str) -> None:
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._terminal.append(None)
+                self._fail.append(0)
+                self._out.append(0)
+            node = nxt
+        if self._terminal[node] != pattern:
+            self._terminal[node] = pattern
+            self._dirty = True
+
+    def remove(self, pattern: str) -> None:
+        node = self._walk(pattern)
+        if node is not None and self._terminal[node] is not None:
+            self._terminal[node] = None
+            self._dirty = True
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """Return ``(start, pattern)`` for every word-bounded occurrence in ``text``."""
+        if self._dirty:
+            self._build()
+        goto, fail, out, terminal = self._goto, self._fail, self._out, self._terminal
+        found: List[Tuple[int, str]] = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = node if terminal[node] is not None else out[node]
+            while hit:
+                pattern = terminal[hit]
+                start = i - len(pattern) + 1
+                if (start == 0 or not _is_word_char(text[start - 1])) and (
+                    i + 1 == len(text) or not _is_word_char(text[i + 1])
+                ):
+                    found.append((start, pattern))
+                hit = out[hit]
+        return found
+
+    def find(self, text: str) -> List[str]:
+        """Leftmost-longest, non-overlapping triggers in ``text``, in order of appearance."""
+        chosen: List[str] = []
+        end = 0
+        for start, pattern in sorted(self.find_all(text), key=lambda m: (m[0], -len(m[1]))):
+            if start >= end and pattern not in chosen:
+                chosen.append(pattern)
+                end = start + len(pattern)
+        return chosen
+
+    def _walk(self, pattern: str) -> Optional[int]:
+        node = 0
+        for ch in pattern:
+            node = self._goto[node].get(ch)
+            if node is None:
+                return None
+        return node
+
+    def _build(self) -> None:
+        goto, fail, out, terminal = self._goto, self._fail, self._out, self._terminal
+        queue = deque()
+        for child in goto[0].values():
+            fail[child] = 0
+            out[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                f = goto[f].get(ch, 0)
+                fail[child] = f
+                # Nearest proper suffix that is itself a live trigger.
+                out[child] = f if terminal[f] is not None else out[f]
+                queue.append(child)
+        self._dirty = False
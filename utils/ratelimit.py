@@ -0,0 +1,154 @@
+"""Token-bucket rate limiting with bounded memory.
+
+``MemoryRateLimiter`` keeps one bucket per key in an LRU-ordered dict capped
+at ``max_keys``. A bucket that has been idle long enough to refill completely
+is indistinguishable from a fresh one, so it is expired from the cold end of
+the dict in O(1) without losing any state.
+
+``RedisRateLimiter`` runs the same algorithm atomically in a Lua script so
+several bot replicas share one budget.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from config import ratelimit_config
+
+
+class RateLimiter(ABC):
+    """``capacity`` events in a burst, refilled at ``rate`` events per second."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        # Seconds for an empty bucket to become full again.
+        self.ttl = capacity / rate
+
+    @abstractmethod
+    async def hit(self, key: str) -> bool:
+        """Consume one token for ``key``; return ``False`` when over budget."""
+
+    @abstractmethod
+    async def refund(self, key: str) -> None:
+        """Give back a token taken by ``hit``, e.g. when a later budget said no."""
+
+    async def wait(self, key: str) -> None:
+        """Block until ``key`` has a token, then consume it."""
+        while not await self.hit(key):
+            await asyncio.sleep(1 / self.rate)
+
+
+class MemoryRateLimiter(RateLimiter):
+    def __init__(self, rate: float, capacity: float, max_keys: int = 100_000) -> None:
+        super().__init__(rate, capacity)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def hit(self, key: str) -> bool:
+        return self.hit_nowait(key)
+
+    def hit_nowait(self, key: str, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        tokens, updated = self._buckets.pop(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        # Re-inserting moves the key to the hot end, keeping the dict ordered by last use.
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed
+
+    async def refund(self, key: str) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            tokens, updated = bucket
+            self._buckets[key] = (min(self.capacity, tokens + 1), updated)
+
+    def _expire(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, (_, updated) = next(iter(buckets.items()))
+            if now - updated < self.ttl:
+                break
+            del buckets[key]
+
+
+_REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local ttl_ms = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], ttl_ms)
+return allowed
+"""
+
+_REDIS_REFUND = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+  redis.call('HSET', KEYS[1], 'tokens', tostring(math.min(tonumber(ARGV[1]), tokens + 1)))
+end
+return 0
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    def __init__(self, redis: Any, prefix: str, rate: float, capacity: float) -> None:
+        super().__init__(rate, capacity)
+        self.prefix = prefix
+        self._script = redis.register_script(_REDIS_TOKEN_BUCKET)
+        self._refund = redis.register_script(_REDIS_REFUND)
+
+    async def hit(self, key: str) -> bool:
+        allowed = await self._script(
+            keys=[f"{self.prefix}:{key}"],
+            args=[self.rate, self.capacity, int(self.ttl * 1000) + 1],
+        )
+        return bool(allowed)
+
+    async def refund(self, key: str) -> None:
+        await self._refund(keys=[f"{self.prefix}:{key}"], args=[self.capacity])
+
+
+_redis_client: Any = None
+
+
+def get_redis() -> Any:
+    global _redis_client
+    if _redis_client is None:
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError("The redis backend needs the 'redis' package installed.") from e
+        _redis_client = aioredis.from_url(ratelimit_config.redis_url)
+    return _redis_client
+
+
+def create_limiter(name: str, rate: float, capacity: float) -> RateLimiter:
+    """Build a limiter on the backend selected by ``RATE_LIMIT_BACKEND``."""
+    if ratelimit_config.backend == "redis":
+        return RedisRateLimiter(get_redis(), f"ratelimit:{name}", rate, capacity)
+    if ratelimit_config.backend == "memory":
+        return MemoryRateLimiter(rate, capacity, max_keys=ratelimit_config.max_keys)
+    raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND: {ratelimit_config.backend!r}")
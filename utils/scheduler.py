@@ -0,0 +1,144 @@
+"""Concurrent update processing with per-chat ordering.
+
+``ScheduledDispatcher.feed_update`` does not run the handlers itself: it puts
+the update on ``update_scheduler`` and returns. Worker tasks of a
+``KeyedQueue`` (utils/keyed_queue.py) keyed by chat then process it:
+
+* Updates from the same chat run strictly one after another, in arrival
+  order, so FSM flows always see the state the previous step left behind.
+* Different chats are handled in parallel by at most ``UPDATE_WORKERS``
+  workers, so one slow handler (a large media upload, a slow query) only
+  delays its own chat.
+* At most ``UPDATE_MAX_BACKLOG`` updates may be queued or running. Past that
+  ``feed_update`` waits for a free slot, which pauses polling (or holds the
+  webhook response) until the workers catch up.
+
+``update_scheduler.stats()`` reports queue depth for sizing the workers and
+is logged every ``UPDATE_STATS_SECONDS`` while updates are waiting.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from config import scheduler_config
+from utils.keyed_queue import KeyedQueue
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+def update_chat_key(update: Update) -> Optional[int]:
+    """Chat the update belongs to (the sender for events without a chat)."""
+    event = update.event
+    chat = getattr(event, "chat", None)
+    if chat is None and getattr(event, "message", None) is not None:
+        # callback_query
+        chat = getattr(event.message, "chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None)
+    return user.id if user is not None else None
+
+
+class UpdateScheduler:
+    def __init__(self, workers: int, max_backlog: int) -> None:
+        self.workers = workers
+        self.max_backlog = max_backlog
+        self._queue: KeyedQueue[Tuple[float, Callable[[], Awaitable[Any]]]] = KeyedQueue(
+            self._handle, workers, "Update"
+        )
+        self._slots = asyncio.Semaphore(max_backlog)
+        # Counters for stats()
+        self.processed = 0
+        self.throttled = 0
+        self.max_queued = 0
+        self.max_wait = 0.0
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._queue) - self._queue.running,
+            "running": self._queue.running,
+            "chats": self._queue.keys,
+            "max_queued": self.max_queued,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "processed": self.processed,
+            "throttled": self.throttled,
+        }
+
+    async def submit(self, key: Optional[Hashable], call: Callable[[], Awaitable[Any]]) -> None:
+        """Queue ``call`` behind earlier work for ``key``; waits while the backlog is full."""
+        if self._slots.locked():
+            self.throttled += 1
+        await self._slots.acquire()
+        if key is None:
+            # Nothing to order against.
+            key = object()
+        self._queue.push(key, (time.monotonic(), call))
+        self.max_queued = max(self.max_queued, len(self._queue) - self._queue.running)
+
+    def start(self) -> None:
+        self._queue.start()
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Give queued updates ``timeout`` seconds to finish, then cancel the workers."""
+        deadline = time.monotonic() + timeout
+        while len(self._queue) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if len(self._queue):
+            logger.warning(f"Dropping {len(self._queue)} unprocessed updates on shutdown")
+        await self._queue.stop()
+
+    async def report_periodically(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            if len(self._queue):
+                logger.info(f"Update scheduler: {self.stats()}")
+
+    async def _handle(self, item: Tuple[float, Callable[[], Awaitable[Any]]]) -> None:
+        queued_at, call = item
+        self.max_wait = max(self.max_wait, time.monotonic() - queued_at)
+        try:
+            await call()
+        except Exception:
+            logger.exception("Update handling crashed")
+        finally:
+            self.processed += 1
+            self._slots.release()
+
+
+class ScheduledDispatcher(Dispatcher):
+    """Dispatcher whose updates are processed by an ``UpdateScheduler``."""
+
+    def __init__(self, *, scheduler: UpdateScheduler, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.scheduler = scheduler
+
+    async def feed_update(self, bot: Bot, update: Update, **kwargs: Any) -> Any:
+        await self.scheduler.submit(
+            update_chat_key(update), partial(super().feed_update, bot, update, **kwargs)
+        )
+
+
+update_scheduler = UpdateScheduler(
+    workers=scheduler_config.workers,
+    max_backlog=scheduler_config.max_backlog,
+)
+
+for _stat, _doc in (
+    ("queued", "Updates waiting for a worker."),
+    ("running", "Updates being handled right now."),
+    ("chats", "Chats with queued or running updates."),
+    ("processed", "Updates handled since start."),
+    ("throttled", "Times intake waited on a full backlog."),
+):
+    registry.gauge(f"bot_update_{_stat}", _doc, lambda stat=_stat: update_scheduler.stats()[stat])
@@ -21,6 +21,10 @@ class BroadcastState(StatesGroup):
     waiting_for_text = State()
 
 
+class MassBroadcastState(StatesGroup):
+    waiting_for_text = State()
+
+
 class ManagerAddState(StatesGroup):
     waiting_for_tg_id = State()
 
@@ -0,0 +1,43 @@
+"""Text normalization for trigger lookup.
+
+Arabic users write the same word with or without harakat and tatweel, and
+mix alef/hamza, taa marbuta and alef maksura forms. Everything is folded
+with a single ``str.translate`` call plus ``casefold``/``split`` (all
+C-level), so normalizing a chat message costs a few microseconds.
+"""
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+# Characters dropped entirely: harakat, Quranic marks, superscript alef,
+# tatweel and invisible direction/joiner marks.
+_REMOVED = (
+    [chr(c) for c in range(0x0610, 0x061B)]
+    + [chr(c) for c in range(0x064B, 0x0660)]
+    + ["\u0670", "\u0640"]
+    + [chr(c) for c in range(0x06D6, 0x06EE)]
+    + ["\u200c", "\u200d", "\u200e", "\u200f", "\ufeff"]
+)
+
+# Letter variants folded onto one canonical form.
+_FOLDED: Dict[str, str] = {
+    "أ": "ا",
+    "إ": "ا",
+    "آ": "ا",
+    "ٱ": "ا",
+    "ة": "ه",
+    "ى": "ي",
+    "ئ": "ي",
+    "ؤ": "و",
+    "ی": "ي",
+    "ک": "ك",
+}
+
+_TABLE = str.maketrans({**{ch: None for ch in _REMOVED}, **_FOLDED})
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Return the lookup key for ``text``: folded, case-insensitive, single-spaced."""
+    if not text:
+        return ""
+    return " ".join(text.translate(_TABLE).casefold().split())
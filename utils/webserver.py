@@ -0,0 +1,74 @@
+"""aiohttp server for the webhook, health/readiness probes and metrics.
+
+Telegram POSTs updates to ``WEBHOOK_PATH``; each request is checked against
+the ``X-Telegram-Bot-Api-Secret-Token`` header and handed to the dispatcher,
+which only queues it on the update scheduler, so slow handlers never hold up
+the HTTP response; a full backlog does, which makes Telegram back off.
+
+The server is started before the caches are warm: ``/healthz`` answers at
+once, ``/readyz`` only after ``startup.mark_ready()``, and the webhook is
+registered with Telegram (``set_webhook``) only then.
+"""
+import logging
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from config import metrics_config, webhook_config
+from utils.metrics import registry
+from utils.startup import startup
+
+logger = logging.getLogger(__name__)
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+async def ready(request: web.Request) -> web.Response:
+    return web.json_response(startup.report(), status=200 if startup.ready else 503)
+
+
+async def metrics(request: web.Request) -> web.Response:
+    return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/healthz", health)
+    app.router.add_get("/readyz", ready)
+    if metrics_config.enabled:
+        app.router.add_get(metrics_config.path, metrics)
+    return app
+
+
+async def start_web_server(app: web.Application) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=webhook_config.host, port=webhook_config.port)
+    await site.start()
+    logger.info(f"Web server listening on {webhook_config.host}:{webhook_config.port}")
+    return runner
+
+
+def add_webhook_handler(app: web.Application, dp: Dispatcher, bot: Bot) -> None:
+    if not webhook_config.base_url or not webhook_config.secret:
+        raise RuntimeError("Webhook mode needs WEBHOOK_BASE_URL and WEBHOOK_SECRET to be set.")
+
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=webhook_config.secret,
+        handle_in_background=False,
+    ).register(app, path=webhook_config.path)
+    setup_application(app, dp, bot=bot)
+
+
+async def set_webhook(dp: Dispatcher, bot: Bot) -> None:
+    """Point Telegram at ``add_webhook_handler``'s route; updates start arriving after this."""
+    await bot.set_webhook(
+        url=webhook_config.base_url.rstrip("/") + webhook_config.path,
+        secret_token=webhook_config.secret,
+        allowed_updates=dp.resolve_used_update_types(),
+    )